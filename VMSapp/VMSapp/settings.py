@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    # Only needed to migrate the tokens issued before authentication.AuthToken
     "rest_framework.authtoken",
 ]
 
@@ -51,6 +53,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "main.middleware.VendorMetricsBatchMiddleware",
 ]
 
 ROOT_URLCONF = "VMSapp.urls"
@@ -77,10 +80,36 @@ WSGI_APPLICATION = "VMSapp.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite profiles, selected with the VMS_DATABASE_PROFILE environment variable.
+# "production" uses write-ahead logging (readers no longer block the writer
+# and the other way round), takes the write lock when a transaction starts
+# and waits up to 5 s for it instead of failing, only syncs at checkpoints,
+# keeps a 64 MB page cache and 256 MB of the file memory-mapped, and reuses
+# connections across requests. PRAGMAS and TRANSACTION_MODE are applied by
+# the main.backends.sqlite3 engine.
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "TRANSACTION_MODE": "IMMEDIATE",
+        "PRAGMAS": {
+            "journal_mode": "wal",
+            "busy_timeout": 5000,
+            "synchronous": "normal",
+            "cache_size": -64000,
+            "mmap_size": 268435456,
+        },
+    },
+}
+
+DATABASE_PROFILE = os.environ.get("VMS_DATABASE_PROFILE", "default")
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "main.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        **SQLITE_PROFILES[DATABASE_PROFILE],
     }
 }
 
@@ -130,8 +159,89 @@ AUTH_USER_MODEL = "authentication.CustomUser"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication'
+        'authentication.backends.CachedTokenAuthentication',
+        'authentication.backends.CachedBasicAuthentication'
     ],
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
+    # Token bucket per user and view class: "N/period" allows bursts of N
+    # requests, refilled at N per period. Writes that recompute vendor
+    # metrics (purchase order changes and acknowledgements) are limited harder
+    'DEFAULT_THROTTLE_CLASSES': [
+        'main.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '6000/min',
+        'write': '1200/min',
+        'recompute': '300/min',
+    },
+    # orjson-backed JSON (falls back to the stdlib when orjson is not installed);
+    # use rest_framework.renderers.JSONRenderer / rest_framework.parsers.JSONParser
+    # to go back to DRF's defaults
+    'DEFAULT_RENDERER_CLASSES': [
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'main.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
+
+# Vendor metric recomputation: "sync", "deferred" (once per vendor after commit)
+# or "background" (deferred, on a local worker thread)
+VENDOR_METRICS_RECOMPUTE = "deferred"
+
+# Caches: "responses" holds the serialized vendor detail and performance history
+# responses, "tokens" the users of authenticated API tokens and "credentials"
+# the users of verified Basic auth credentials, "throttle" the rate limit
+# buckets. Use e.g.
+# django.core.cache.backends.filebased.FileBasedCache to share them between
+# worker processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": "main.cache.BoundedLocMemCache",
+        "LOCATION": "vms-responses",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "tokens": {
+        "BACKEND": "main.cache.BoundedLocMemCache",
+        "LOCATION": "vms-tokens",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "credentials": {
+        "BACKEND": "main.cache.BoundedLocMemCache",
+        "LOCATION": "vms-credentials",
+        "TIMEOUT": 30,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    "throttle": {
+        "BACKEND": "main.cache.BoundedLocMemCache",
+        "LOCATION": "vms-throttle",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# CACHES alias of the vendor response cache, or None to disable it
+VENDOR_RESPONSE_CACHE = "responses"
+
+# Coalesce concurrent misses of the same response across worker processes with
+# a lock in the cache backend (needs a cache shared by the workers)
+VENDOR_RESPONSE_CACHE_LOCK = False
+
+# Lifetime of the API tokens issued at login, in seconds
+AUTH_TOKEN_TTL = 60 * 60 * 24 * 7
+
+# CACHES alias of the token authentication cache, or None to disable it
+AUTH_TOKEN_CACHE = "tokens"
+
+# CACHES alias of the verified Basic auth credentials, or None to disable it
+AUTH_CREDENTIAL_CACHE = "credentials"
+
+# CACHES alias of the API rate limit buckets
+API_THROTTLE_CACHE = "throttle"
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from .cache import token_cache, credential_cache
+from .models import AuthToken
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Authentication with expiring AuthTokens. Tokens of active users are
+    looked up in the token cache before querying the token and user tables
+    (with a single join), and their expiry is checked on the loaded row, so
+    rejecting an expired token takes no extra query.
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+
+        if token.has_expired():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return token.user, token
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication that remembers verified credentials in the credential
+    cache, so that only the first request of a client within the cache
+    timeout pays for the password hasher. Failed attempts are never cached.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        user = credential_cache.get(userid, password)
+        if user is not None:
+            return user, None
+
+        # The generation is read before the password is checked: a password
+        # change in between leaves the entry under a stale generation
+        User = get_user_model()
+        user_pk = User._default_manager.filter(**{User.USERNAME_FIELD: userid}).values_list('pk', flat=True).first()
+        generation = credential_cache.generation(user_pk) if user_pk is not None else None
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        if user.pk == user_pk:
+            credential_cache.set(userid, password, user, generation)
+        return user, auth
@@ -0,0 +1,169 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+
+
+class AuthCache:
+    """
+    Base of the authentication caches: a cache selected with a setting (a
+    CACHES alias, or None to disable it) and hit/miss counters.
+    """
+    setting = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        alias = getattr(settings, self.setting, None)
+        return caches[alias] if alias else None
+
+    def _count(self, name, count=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def _delete(self, cache, keys):
+        # Now and again once the current transaction commits (requests may
+        # refill the entries in between)
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        self._count('invalidations', len(keys))
+
+    def stats(self):
+        cache = self.cache
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else None,
+                    'invalidations': self.invalidations,
+                    'evictions': getattr(cache, 'evictions', None)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+
+class TokenCache(AuthCache):
+    """
+    Cache of authenticated tokens (with their user) by key, stored in the
+    cache selected with the AUTH_TOKEN_CACHE setting.
+
+    The default alias is a bounded in-process cache whose timeout is the TTL
+    of an entry; a shared backend makes a logout or deactivation in one
+    worker process visible to all of them.
+
+    Entries are dropped when their token is deleted (logout) and whenever
+    their user is saved (deactivation, password or permission changes).
+    """
+    setting = 'AUTH_TOKEN_CACHE'
+
+    @staticmethod
+    def _key(token_key):
+        return f"auth-token:{token_key}"
+
+    def get(self, token_key):
+        """
+        Return the cached token, or None.
+        """
+        cache = self.cache
+        if cache is None:
+            return None
+
+        token = cache.get(self._key(token_key))
+        self._count('hits' if token is not None else 'misses')
+        return token
+
+    def set(self, token):
+        cache = self.cache
+        if cache is not None:
+            cache.set(self._key(token.key), token)
+
+    def invalidate(self, *token_keys):
+        """
+        Drop the given tokens.
+        """
+        cache = self.cache
+        if cache is not None and token_keys:
+            self._delete(cache, [self._key(token_key) for token_key in token_keys])
+
+
+class CredentialCache(AuthCache):
+    """
+    Cache of users whose Basic auth credentials were verified, stored in the
+    cache selected with the AUTH_CREDENTIAL_CACHE setting, so that repeated
+    requests skip the password hasher.
+
+    Entries are keyed by an HMAC of the credentials (keyed with SECRET_KEY),
+    never by the credentials themselves. Every user has a random generation
+    that is read before the password is checked and stored with the entry;
+    saving the user (password change, deactivation...) deletes it, which
+    orphans all of its entries at once, including ones being filled.
+    """
+    setting = 'AUTH_CREDENTIAL_CACHE'
+
+    @staticmethod
+    def _key(userid, password):
+        digest = salted_hmac("authentication.cache.CredentialCache", f"{userid}\0{password}",
+                             algorithm="sha256").hexdigest()
+        return f"auth-basic:{digest}"
+
+    @staticmethod
+    def _generation_key(user_pk):
+        return f"auth-basic-user:{user_pk}"
+
+    def generation(self, user_pk):
+        """
+        Return the current generation of a user's entries, creating it if needed.
+        """
+        cache = self.cache
+        if cache is None:
+            return None
+
+        key = self._generation_key(user_pk)
+        generation = cache.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            if not cache.add(key, generation, timeout=None):
+                generation = cache.get(key, generation)
+        return generation
+
+    def get(self, userid, password):
+        """
+        Return the cached user of verified credentials, or None.
+        """
+        cache = self.cache
+        if cache is None:
+            return None
+
+        user = None
+        entry = cache.get(self._key(userid, password))
+        if entry is not None:
+            user, generation = entry
+            if cache.get(self._generation_key(user.pk)) != generation:
+                user = None
+        self._count('hits' if user is not None else 'misses')
+        return user
+
+    def set(self, userid, password, user, generation):
+        cache = self.cache
+        if cache is not None and generation is not None:
+            cache.set(self._key(userid, password), (user, generation))
+
+    def invalidate_user(self, user_pk):
+        """
+        Drop all the cached credentials of a user.
+        """
+        cache = self.cache
+        if cache is not None:
+            self._delete(cache, [self._generation_key(user_pk)])
+
+
+token_cache = TokenCache()
+credential_cache = CredentialCache()
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authentication.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired API tokens in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of tokens deleted per transaction")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches, letting other writers in")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        # Keys are bound as parameters of the DELETE
+        batch_size = min(batch_size, connection.features.max_query_params or batch_size)
+
+        start = time.perf_counter()
+        now = timezone.now()
+        expired = AuthToken.objects.filter(expires_at__lte=now)
+        deleted = batches = 0
+        while True:
+            # Each batch is picked with the expiry index and deleted in its own
+            # short transaction, so that the write lock (the whole database on
+            # SQLite) is never held for long
+            keys = list(expired.order_by('expires_at').values_list('key', flat=True)[:batch_size])
+            if not keys:
+                break
+            with transaction.atomic():
+                count, _ = expired.filter(key__in=keys).delete()
+            deleted += count
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired token(s) in {batches} batch(es), in {elapsed:.2f}s"
+        ))
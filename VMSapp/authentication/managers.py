@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
@@ -30,3 +31,16 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_("Superuser must have is_superuser set to True"))
 
         return self.create_user(email, password, **extra_fields)
+
+
+class AuthTokenManager(models.Manager):
+    def issue(self, user, device=""):
+        """
+        Return the token of a user on a device, replacing it with a new one
+        if it has expired
+        """
+        token, created = self.get_or_create(user=user, device=device)
+        if not created and token.has_expired():
+            token.delete()
+            token = self.create(user=user, device=device)
+        return token
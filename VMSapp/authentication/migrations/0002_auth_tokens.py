@@ -0,0 +1,69 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:32
+
+import datetime
+
+import authentication.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def copy_tokens(apps, schema_editor):
+    # Tokens issued before expiring tokens keep working for one lifetime
+    Token = apps.get_model("authtoken", "Token")
+    AuthToken = apps.get_model("authentication", "AuthToken")
+    expires_at = timezone.now() + datetime.timedelta(seconds=settings.AUTH_TOKEN_TTL)
+    AuthToken.objects.bulk_create(
+        (AuthToken(key=token.key, user_id=token.user_id, expires_at=expires_at)
+         for token in Token.objects.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+        ("authtoken", "0003_tokenproxy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthToken",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        max_length=40,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="key",
+                    ),
+                ),
+                ("device", models.CharField(blank=True, default="", max_length=100)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True, default=authentication.models.token_expiry
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="auth_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="authtoken",
+            constraint=models.UniqueConstraint(
+                fields=("user", "device"), name="unique_token_per_device"
+            ),
+        ),
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,14 @@
+import binascii
+import datetime
+import os
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from .managers import CustomUserManager
+from .managers import CustomUserManager, AuthTokenManager
 
 
 # Create your models here.
@@ -14,3 +20,42 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
+
+
+def token_expiry():
+    return timezone.now() + datetime.timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+class AuthToken(models.Model):
+    """
+    API token of a user on one device. A user has at most one token per
+    device; tokens stop authenticating once they expire and are deleted by
+    the purge_expired_tokens command.
+    """
+    key = models.CharField(_("key"), max_length=40, primary_key=True)
+    user = models.ForeignKey(CustomUser, related_name="auth_tokens", on_delete=models.CASCADE)
+    device = models.CharField(max_length=100, blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=token_expiry, db_index=True)
+
+    objects = AuthTokenManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "device"], name="unique_token_per_device"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    def has_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def __str__(self):
+        return self.key
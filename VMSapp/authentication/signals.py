@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import token_cache, credential_cache
+from .models import CustomUser, AuthToken
+
+
+# Deleting a token (logout, purge, or the cascade of a deleted user) must end
+# its cached authentication right away
+@receiver(post_delete, sender=AuthToken)
+def forget_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+# A saved user may have been deactivated or lost permissions: drop the cached
+# copies so that the next request reloads it
+@receiver(post_save, sender=CustomUser)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    if created or token_cache.cache is None:
+        return
+    token_cache.invalidate(*AuthToken.objects.filter(user=instance).values_list('key', flat=True))
+
+
+# Same for verified Basic auth credentials, which also go stale when the
+# password changes
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_user_credentials(sender, instance, created=False, **kwargs):
+    if not created:
+        credential_cache.invalidate_user(instance.pk)
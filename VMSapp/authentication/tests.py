@@ -1,11 +1,23 @@
+import base64
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
-from .models import CustomUser
+from .cache import token_cache, credential_cache
+from .models import CustomUser, AuthToken
 from .views import UserLoginView
 
 
@@ -52,7 +64,7 @@ class UserManagerTests(TestCase):
 class AuthenticateAPITestCase(APITestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_user(email="testuser@user.com", password="password123")
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
     def test_login_success(self):
         url = reverse("auth:login")
@@ -91,7 +103,7 @@ class AuthenticateAPITestCase(APITestCase):
 class UserLogoutViewTestCase(APITestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_superuser(email="testuser@user.com", password="password123")
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
@@ -114,3 +126,201 @@ class UserLogoutViewTestCase(APITestCase):
         self.assertIn('error', response.data)
 
         print("Test: Logout failed due to invalid token -> Completed")
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        caches['tokens'].clear()
+        token_cache.reset_stats()
+
+        self.user = CustomUser.objects.create_superuser(email="testuser@user.com", password="password123")
+        self.token = AuthToken.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_vendors(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main:vendor"))
+        token_queries = [query for query in queries if 'authentication_authtoken' in query['sql']]
+        return response, token_queries
+
+    def test_cached_token(self):
+        """
+        Test that only the first request of a token queries it
+        """
+        response, token_queries = self.get_vendors()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(token_queries), 1)
+
+        for _ in range(3):
+            response, token_queries = self.get_vendors()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(token_queries, [])
+            self.assertEqual(response.wsgi_request.user, self.user)
+            self.assertEqual(response.wsgi_request.auth.key, self.token.key)
+
+        stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (3, 1, 0.75))
+        print("Test: Cached token authentication -> Completed")
+
+    def test_logout_invalidates_token(self):
+        """
+        Test that a logged out token is rejected right away
+        """
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_200_OK)
+
+        response = self.client.post(reverse('auth:logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(token_cache.stats()['invalidations'], 1)
+        print("Test: Logout invalidates cached token -> Completed")
+
+    def test_deactivation_invalidates_token(self):
+        """
+        Test that the token of a deactivated user is rejected right away
+        """
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+        print("Test: Deactivation invalidates cached token -> Completed")
+
+
+class CachedBasicAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        caches['credentials'].clear()
+        credential_cache.reset_stats()
+
+        self.user = CustomUser.objects.create_superuser(email="testuser@user.com", password="password123")
+
+    def get_vendors(self, password="password123"):
+        credentials = base64.b64encode(f"testuser@user.com:{password}".encode()).decode()
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=hashers.check_password) as check:
+            response = self.client.get(reverse("main:vendor"), HTTP_AUTHORIZATION=f'Basic {credentials}')
+        return response, check.call_count
+
+    def test_cached_credentials(self):
+        """
+        Test that only the first request with the same credentials checks the password
+        """
+        self.assertEqual(self.get_vendors(), (mock.ANY, 1))
+        for _ in range(3):
+            response, checks = self.get_vendors()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(checks, 0)
+            self.assertEqual(response.wsgi_request.user, self.user)
+
+        stats = credential_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (3, 1, 0.75))
+        print("Test: Cached Basic auth credentials -> Completed")
+
+    def test_invalid_credentials_not_cached(self):
+        """
+        Test that wrong passwords are checked (and rejected) on every request
+        """
+        self.get_vendors()
+        for _ in range(2):
+            response, checks = self.get_vendors(password="password")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(checks, 1)
+        print("Test: Invalid Basic auth credentials are not cached -> Completed")
+
+    def test_password_change_invalidates_credentials(self):
+        """
+        Test that the old password is rejected right after a password change
+        """
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_200_OK)
+
+        self.user.set_password("password456")
+        self.user.save()
+
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_vendors(password="password456")[0].status_code, status.HTTP_200_OK)
+        print("Test: Password change invalidates cached credentials -> Completed")
+
+    def test_deactivation_invalidates_credentials(self):
+        """
+        Test that the credentials of a deactivated user are rejected right away
+        """
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_vendors()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+        print("Test: Deactivation invalidates cached credentials -> Completed")
+
+
+class ExpiringTokenTestCase(APITestCase):
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = CustomUser.objects.create_user(email="testuser@user.com", password="password123")
+
+    def login(self, device=None):
+        data = {'email': 'testuser@user.com', 'password': 'password123'}
+        if device is not None:
+            data['device'] = device
+        response = self.client.post(reverse("auth:login"), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def get_vendors(self, key):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main:vendor"), HTTP_AUTHORIZATION=f'Token {key}')
+        token_queries = [query for query in queries if 'authentication_authtoken' in query['sql']]
+        return response.status_code, len(token_queries)
+
+    def test_tokens_per_device(self):
+        """
+        Test that every device gets its own token, reused until it expires
+        """
+        phone = self.login("phone")
+        laptop = self.login("laptop")
+        self.assertNotEqual(phone, laptop)
+        self.assertEqual(self.login("phone"), phone)
+        self.assertEqual(self.login(), self.login())
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 3)
+
+        AuthToken.objects.filter(key=phone).update(expires_at=timezone.now())
+        new_phone = self.login("phone")
+        self.assertNotEqual(new_phone, phone)
+        self.assertFalse(AuthToken.objects.filter(key=phone).exists())
+
+        response = self.client.post(reverse("auth:login"), {'email': 'testuser@user.com', 'password': 'password123',
+                                                            'device': 'x' * 101})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print("Test: Tokens per device -> Completed")
+
+    def test_expired_token_rejected(self):
+        """
+        Test that expired tokens are rejected without extra queries, cached or not
+        """
+        expired = AuthToken.objects.create(user=self.user, device="old",
+                                           expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.get_vendors(expired.key), (status.HTTP_401_UNAUTHORIZED, 1))
+
+        key = self.login()
+        self.assertEqual(self.get_vendors(key), (status.HTTP_200_OK, 1))
+        self.assertEqual(self.get_vendors(key), (status.HTTP_200_OK, 0))
+
+        later = timezone.now() + datetime.timedelta(seconds=settings.AUTH_TOKEN_TTL + 1)
+        with mock.patch('authentication.models.timezone.now', return_value=later):
+            self.assertEqual(self.get_vendors(key), (status.HTTP_401_UNAUTHORIZED, 0))
+        print("Test: Expired token rejected -> Completed")
+
+    def test_purge_expired_tokens(self):
+        """
+        Test purging expired tokens in batches
+        """
+        past = timezone.now() - datetime.timedelta(days=1)
+        for i in range(5):
+            AuthToken.objects.create(user=self.user, device=f"old{i}", expires_at=past)
+        valid = {self.login(), self.login("phone")}
+
+        out = StringIO()
+        call_command('purge_expired_tokens', batch_size=2, stdout=out)
+        self.assertIn("Deleted 5 expired token(s) in 3 batch(es)", out.getvalue())
+        self.assertEqual(set(AuthToken.objects.values_list('key', flat=True)), valid)
+        print("Test: Purge expired tokens -> Completed")
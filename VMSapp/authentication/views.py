@@ -3,10 +3,10 @@ from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 
 
+from .models import AuthToken
 from .serializers import UserSerializer
 
 
@@ -22,12 +22,15 @@ class UserLoginView(APIView):
             return Response({'error': 'Email and password are required'}, status=status.HTTP_400_BAD_REQUEST)
         elif "password" not in request.data:
             return Response({'error': 'Password is required'}, status=status.HTTP_400_BAD_REQUEST)
+        elif len(str(request.data.get('device', ''))) > AuthToken._meta.get_field('device').max_length:
+            return Response({'error': 'Device name is too long'}, status=status.HTTP_400_BAD_REQUEST)
         else:
             user = authenticate(email=request.data['email'], password=request.data['password'])
 
             if user:
-                token, created = Token.objects.get_or_create(user=user)
-                return Response({'token': token.key}, status=status.HTTP_200_OK)
+                # One token per device: logging in from another device does not end the other sessions
+                token = AuthToken.objects.issue(user, device=str(request.data.get('device', '')))
+                return Response({'token': token.key, 'expires_at': token.expires_at}, status=status.HTTP_200_OK)
             else:
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -39,8 +42,8 @@ class UserLogoutView(APIView):
 
         # Check if the token exists
         try:
-            token = Token.objects.get(key=token_key)
-        except Token.DoesNotExist:
+            token = AuthToken.objects.get(key=token_key)
+        except AuthToken.DoesNotExist:
             return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
 
         # Delete the token
@@ -0,0 +1,50 @@
+"""
+Requests/s of authenticated API calls with and without the authentication caches.
+
+    python -m benchmarks.bench_auth [--requests 100]
+"""
+import argparse
+import base64
+
+from benchmarks.utils import create_vendor, measure, test_database
+
+from django.core.cache import caches
+from django.test import Client, override_settings
+
+from authentication.models import CustomUser, AuthToken
+
+
+def compare(label, client, url, requests, headers, setting, alias):
+    with override_settings(**{setting: None}):
+        with measure(f"{label}: uncached", rows=requests, unit="requests"):
+            for _ in range(requests):
+                assert client.get(url, **headers).status_code == 200
+
+    caches[alias].clear()
+    with measure(f"{label}: cached", rows=requests, unit="requests"):
+        for _ in range(requests):
+            assert client.get(url, **headers).status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    with test_database():
+        create_vendor("BENCH")
+        user = CustomUser.objects.create_user(email="bench@example.com", password="password123")
+        token = AuthToken.objects.create(user=user)
+        client = Client()
+        url = "/api/vendor/BENCH/"
+        print(f"{args.requests} requests of GET {url}\n")
+
+        credentials = base64.b64encode(b"bench@example.com:password123").decode()
+        compare("Basic auth", client, url, args.requests, {'HTTP_AUTHORIZATION': f'Basic {credentials}'},
+                'AUTH_CREDENTIAL_CACHE', 'credentials')
+        compare("token auth", client, url, args.requests, {'HTTP_AUTHORIZATION': f'Token {token.key}'},
+                'AUTH_TOKEN_CACHE', 'tokens')
+
+
+if __name__ == '__main__':
+    main()
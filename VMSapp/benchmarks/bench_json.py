@@ -0,0 +1,64 @@
+"""
+Rendering and parsing time of the large API payloads: DRF's JSONRenderer/JSONParser against the orjson-backed ones.
+
+    python -m benchmarks.bench_json [--orders 20000]
+"""
+import argparse
+import gc
+from io import BytesIO
+
+from benchmarks.bench_serializers import seed_performance
+from benchmarks.utils import create_vendor, measure, seed_orders, test_database
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from main.models import PurchaseOrderModel, HistoricalPerformanceModel
+from main.renderers import FastJSONRenderer, FastJSONParser, orjson
+from main.serializers import PurchaseOrderModelSerializer, HistoricalPerformanceModelSerializer, ValuesSerializer
+
+
+def compare(label, data):
+    rows = len(data)
+    # Collect before each step so that garbage of the previous one is not charged to it
+    gc.collect()
+    with measure(f"{label}: render JSONRenderer", rows=rows):
+        body = JSONRenderer().render(data)
+    gc.collect()
+    with measure(f"{label}: render FastJSONRenderer", rows=rows):
+        fast_body = FastJSONRenderer().render(data)
+    assert body == fast_body, f"{label}: rendered output differs"
+
+    gc.collect()
+    with measure(f"{label}: parse JSONParser", rows=rows):
+        JSONParser().parse(BytesIO(body))
+    gc.collect()
+    with measure(f"{label}: parse FastJSONParser", rows=rows):
+        FastJSONParser().parse(BytesIO(body))
+    print(f"{label}: {len(body) / 1024 / 1024:.1f} MB\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed: FastJSONRenderer/FastJSONParser fall back to the stdlib\n")
+
+    with test_database():
+        vendor = create_vendor("BENCH")
+        seed_orders(vendor, args.orders)
+        seed_performance(vendor, args.orders)
+        print(f"{args.orders} purchase orders and performance records\n")
+
+        orders = ValuesSerializer(PurchaseOrderModelSerializer)
+        compare("purchase order list", orders.data(orders.values(PurchaseOrderModel.objects.order_by('pk'))))
+
+        history = ValuesSerializer(HistoricalPerformanceModelSerializer)
+        compare("performance history",
+                history.data(history.values(HistoricalPerformanceModel.objects.order_by('date', 'id'))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Rows/s of the list serializers: DRF ModelSerializer(many=True) against the .values() fast path.
+
+    python -m benchmarks.bench_serializers [--orders 20000] [--vendors 2000]
+"""
+import argparse
+
+from benchmarks.utils import create_vendor, measure, seed_orders, test_database
+
+from django.utils import timezone
+
+from main.models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
+from main.serializers import VendorModelSerializer, PurchaseOrderModelSerializer, \
+    HistoricalPerformanceModelSerializer, ValuesSerializer
+
+
+def seed_vendors(count):
+    VendorModel.objects.bulk_create(
+        VendorModel(vendor_code=f"V{i}", name=f"Vendor {i}", contact_details="9900990099",
+                    address="Benchmark location", on_time_delivery_rate=0.5, quality_rating_avg=3.5,
+                    average_response_time=1.25, fulfillment_rate=0.75)
+        for i in range(count)
+    )
+
+
+def seed_performance(vendor, count):
+    now = timezone.now()
+    HistoricalPerformanceModel.objects.bulk_create(
+        HistoricalPerformanceModel(vendor=vendor, date=now, on_time_delivery_rate=0.5, quality_rating_avg=3.5,
+                                   average_response_time=1.25, fulfillment_rate=0.75)
+        for _ in range(count)
+    )
+
+
+def compare(label, serializer_class, queryset):
+    rows = queryset.count()
+    with measure(f"{label}: ModelSerializer", rows=rows):
+        slow = serializer_class(queryset, many=True).data
+
+    fast_serializer = ValuesSerializer(serializer_class)
+    with measure(f"{label}: values() fast path", rows=rows):
+        fast = fast_serializer.data(fast_serializer.values(queryset))
+
+    assert list(slow) == fast, f"{label}: outputs differ"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--vendors', type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database():
+        seed_vendors(args.vendors)
+        vendor = create_vendor("BENCH")
+        seed_orders(vendor, args.orders)
+        seed_performance(vendor, args.orders)
+        print(f"{args.vendors} vendors, {args.orders} purchase orders and performance records\n")
+
+        compare("vendors", VendorModelSerializer, VendorModel.objects.order_by('pk'))
+        compare("purchase orders", PurchaseOrderModelSerializer, PurchaseOrderModel.objects.order_by('pk'))
+        compare("performance", HistoricalPerformanceModelSerializer,
+                HistoricalPerformanceModel.objects.order_by('date', 'id'))
+
+
+if __name__ == '__main__':
+    main()
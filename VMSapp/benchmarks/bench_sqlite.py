@@ -0,0 +1,131 @@
+"""
+Throughput of concurrent writers and readers on a SQLite file with each database profile (SQLITE_PROFILES).
+
+    python -m benchmarks.bench_sqlite [--writers 4] [--readers 8] [--duration 5] [--vendors 10] [--orders 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from benchmarks.utils import create_vendor, seed_orders
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.test.utils import override_settings
+
+from main import metrics
+from main.models import PurchaseOrderModel, VendorModel
+
+
+@contextmanager
+def file_database(profile):
+    """
+    Point the default database at a freshly migrated file in a temporary
+    directory, configured with the given profile. Unlike the test database
+    of the other benchmarks this is not in memory, so locking and syncing
+    behave as in production.
+    """
+    # The settings dict is shared by the connections of every thread
+    database = connections.settings['default']
+    original = dict(database)
+    with tempfile.TemporaryDirectory() as directory:
+        connections.close_all()
+        database.pop('PRAGMAS', None)
+        database.pop('TRANSACTION_MODE', None)
+        database.update({'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+        database.update(settings.SQLITE_PROFILES[profile], NAME=os.path.join(directory, 'bench.sqlite3'))
+        try:
+            call_command('migrate', verbosity=0)
+            yield
+        finally:
+            connections.close_all()
+            database.clear()
+            database.update(original)
+
+
+def seed(vendors, orders):
+    vendor_codes = []
+    for i in range(vendors):
+        vendor = create_vendor(f"BENCH{i}")
+        seed_orders(vendor, orders, prefix=f"PO{i}-")
+        metrics.rebuild_aggregates(vendor.vendor_code)
+        vendor_codes.append(vendor.vendor_code)
+    completed = list(PurchaseOrderModel.objects.filter(status="COMPLETED").values_list('pk', flat=True))
+    return vendor_codes, completed
+
+
+def write(completed):
+    # Re-rate a completed order: a purchase order update and a vendor metric recompute
+    with transaction.atomic():
+        order = PurchaseOrderModel.objects.get(pk=random.choice(completed))
+        order.quality_rating = float(random.randint(0, 5))
+        order.save()
+
+
+def read(vendor_codes):
+    vendor_code = random.choice(vendor_codes)
+    VendorModel.objects.get(pk=vendor_code)
+    list(PurchaseOrderModel.objects.filter(vendor_id=vendor_code).order_by('pk').values()[:50])
+
+
+def run(operation, deadline, results):
+    done = failed = 0
+    try:
+        while time.monotonic() < deadline:
+            try:
+                operation()
+                done += 1
+            except OperationalError:
+                # database is locked
+                failed += 1
+            # What Django does at the start and end of every request
+            close_old_connections()
+    finally:
+        connections.close_all()
+        results.append((done, failed))
+
+
+def bench(profile, args):
+    with file_database(profile), override_settings(VENDOR_METRICS_RECOMPUTE="sync"):
+        vendor_codes, completed = seed(args.vendors, args.orders)
+        connections.close_all()
+
+        writes, reads = [], []
+        deadline = time.monotonic() + args.duration
+        threads = [threading.Thread(target=run, args=(lambda: write(completed), deadline, writes))
+                   for _ in range(args.writers)]
+        threads += [threading.Thread(target=run, args=(lambda: read(vendor_codes), deadline, reads))
+                    for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for label, results in (("writes", writes), ("reads", reads)):
+        done = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        print(f"{profile:<12} {label:<8} {done / args.duration:10.0f} /s {failed:8d} failed (database is locked)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--vendors', type=int, default=10)
+    parser.add_argument('--orders', type=int, default=1000, help="Purchase orders per vendor")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer and {args.readers} reader threads for {args.duration:.0f} s, "
+          f"{args.vendors} vendors with {args.orders} purchase orders each\n")
+    for profile in settings.SQLITE_PROFILES:
+        bench(profile, args)
+
+
+if __name__ == '__main__':
+    main()
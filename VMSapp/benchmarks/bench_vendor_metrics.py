@@ -0,0 +1,65 @@
+"""
+Queries and latency of a vendor metric recompute on a vendor with a large order history.
+
+    python -m benchmarks.bench_vendor_metrics [--orders 100000] [--completions 50]
+"""
+import argparse
+
+from benchmarks.utils import create_vendor, measure, seed_orders, test_database
+
+from django.db.models import Avg, F, fields
+from django.db.models.functions import Cast
+
+from main import metrics
+from main.models import PurchaseOrderModel
+
+
+def legacy_metrics(vendor, delivery_date):
+    # The separate COUNT/AVG queries the signal used to run on every completion
+    on_time = PurchaseOrderModel.objects.filter(vendor=vendor, status='COMPLETED',
+                                                completion_date__lte=delivery_date).count()
+    completed = PurchaseOrderModel.objects.filter(vendor=vendor, status="COMPLETED").count()
+    PurchaseOrderModel.objects.filter(vendor=vendor).aggregate(Avg('quality_rating', default=0))
+    PurchaseOrderModel.objects.filter(vendor=vendor, status="COMPLETED").aggregate(
+        response=Avg(Cast(F('acknowledgement_date') - F('issue_date'), fields.FloatField())))
+    PurchaseOrderModel.objects.filter(vendor=vendor, status="COMPLETED").count()
+    issued = PurchaseOrderModel.objects.filter(vendor=vendor).count()
+    return on_time / completed if completed else 0, completed / issued if issued else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--completions', type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        vendor = create_vendor("BENCH")
+        seed_orders(vendor, args.orders, completed_ratio=0.7)
+        metrics.rebuild_aggregates(vendor.vendor_code)
+        print(f"Vendor with {args.orders} purchase orders, {args.completions} completions per run\n")
+
+        pending = list(PurchaseOrderModel.objects.filter(vendor=vendor, status="PENDING")[:args.completions])
+
+        with measure("legacy: separate COUNT/AVG queries"):
+            for order in pending:
+                legacy_metrics(vendor, order.delivery_date)
+
+        with measure("single-pass conditional aggregation"):
+            for order in pending:
+                metrics.derive_metrics(PurchaseOrderModel.objects.filter(vendor=vendor).metric_aggregates())
+
+        with measure("incremental: save() of a completion"):
+            for order in pending:
+                order.status = "COMPLETED"
+                order.save()
+
+        with measure("grouped aggregation over all vendors"):
+            PurchaseOrderModel.objects.metric_aggregates_by_vendor()
+
+        mismatches = metrics.reconcile()
+        print(f"\nReconciliation mismatches: {len(mismatches)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import datetime
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "VMSapp.settings")
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from main.models import VendorModel, PurchaseOrderModel
+
+
+@contextmanager
+def test_database():
+    """
+    Run the benchmark against a freshly migrated throw-away test database.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def measure(label, rows=None, unit="rows"):
+    """
+    Print the wall time and number of queries of the wrapped block.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+
+    line = f"{label:<45} {elapsed * 1000:10.2f} ms {len(queries):8d} queries"
+    if rows:
+        line += f" {rows / elapsed:12.0f} {unit}/s"
+    print(line)
+
+
+def create_vendor(vendor_code):
+    return VendorModel.objects.create(
+        vendor_code=vendor_code,
+        name=f"Vendor {vendor_code}",
+        contact_details="9900990099",
+        address="Benchmark location",
+        on_time_delivery_rate=0.0,
+        quality_rating_avg=0.0,
+        average_response_time=0.0,
+        fulfillment_rate=0.0
+    )
+
+
+def with_derived_fields(order):
+    order.set_derived_fields()
+    return order
+
+
+def seed_orders(vendor, count, prefix="PO", completed_ratio=0.7, batch_size=5000):
+    """
+    Insert purchase orders for a vendor with bulk_create (no signals).
+    """
+    now = timezone.now()
+    completed = int(count * completed_ratio)
+    orders = (
+        with_derived_fields(PurchaseOrderModel(
+            po_number=f"{prefix}{i}",
+            vendor=vendor,
+            order_date=now - datetime.timedelta(days=10),
+            delivery_date=now + datetime.timedelta(days=i % 3 - 1),
+            items=[{"name": "Item", "price": "2.50"}],
+            quantity=1 + i % 5,
+            status="COMPLETED" if i < completed else "PENDING",
+            quality_rating=float(i % 6) if i < completed else None,
+            issue_date=now - datetime.timedelta(days=9),
+            acknowledgement_date=now - datetime.timedelta(days=9, hours=-(i % 48)),
+            completion_date=now if i < completed else None,
+        ))
+        for i in range(count)
+    )
+
+    batch = []
+    for order in orders:
+        batch.append(order)
+        if len(batch) == batch_size:
+            PurchaseOrderModel.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        PurchaseOrderModel.objects.bulk_create(batch)
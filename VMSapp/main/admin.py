@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
+from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel, VendorMetricsModel
 # Register your models here.
 
 
@@ -19,4 +19,10 @@ class PurchaseOrderModelAdmin(admin.ModelAdmin):
 @admin.register(HistoricalPerformanceModel)
 class HistoricalPerformanceModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'vendor', 'date']
-    ordering = ['id']
\ No newline at end of file
+    ordering = ['id']
+
+
+@admin.register(VendorMetricsModel)
+class VendorMetricsModelAdmin(admin.ModelAdmin):
+    list_display = ['vendor', 'issued_count', 'completed_count']
+    ordering = ("vendor",)
\ No newline at end of file
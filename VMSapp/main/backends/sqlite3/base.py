@@ -0,0 +1,23 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend with two extra settings (see SQLITE_PROFILES):
+
+    - PRAGMAS: pragmas run on every new connection, e.g. {"journal_mode": "wal"}.
+    - TRANSACTION_MODE: "IMMEDIATE" starts transactions with BEGIN IMMEDIATE,
+      which takes the write lock up front. With deferred transactions a
+      transaction that reads and then writes cannot wait for another writer
+      (busy_timeout does not apply) and fails with "database is locked".
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE')
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Entries removed by culling, per LocMemCache location
+_evictions = defaultdict(int)
+
+_MISSING = object()
+
+# Cross-worker single-flight: how long a worker waits for another worker's
+# computation before doing it itself, and how often it looks for the result
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    LocMemCache that counts the entries it evicts once MAX_ENTRIES is reached.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._name = name
+
+    def _cull(self):
+        # Called with the location's lock held
+        size = len(self._cache)
+        super()._cull()
+        _evictions[self._name] += size - len(self._cache)
+
+    @property
+    def evictions(self):
+        return _evictions[self._name]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time: callers arriving while a
+    computation is in flight wait for it and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, compute):
+        """
+        Return (result, shared), where shared tells whether the result came
+        from another caller's computation.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized vendor responses (vendor detail and
+    performance history), stored in the cache selected with the
+    VENDOR_RESPONSE_CACHE setting (a CACHES alias, or None to disable it).
+
+    Entries are keyed by vendor, view, query string and the ETag of the
+    vendor version the response was computed for, so a cached body always
+    matches the ETag it is served with, even when the write happened in
+    another worker process (whose invalidation does not reach a process-local
+    cache). Every vendor also has a random token that is part of its keys;
+    invalidating a vendor deletes the token, which orphans all of its
+    entries at once.
+
+    Concurrent misses of the same entry are coalesced: within a process only
+    one thread computes it while the others wait, and with the
+    VENDOR_RESPONSE_CACHE_LOCK setting a lock in the cache backend does the
+    same across worker processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        alias = getattr(settings, 'VENDOR_RESPONSE_CACHE', None)
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _token_key(vendor_code):
+        return f"vendor-token:{vendor_code}"
+
+    def _token(self, cache, vendor_code):
+        key = self._token_key(vendor_code)
+        token = cache.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            if not cache.add(key, token, timeout=None):
+                token = cache.get(key, token)
+        return token
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def entry_key(self, cache, name, vendor_code, params=None, etag=None):
+        query = '&'.join(sorted(params.urlencode().split('&'))) if params else ""
+        shape = hashlib.md5(query.encode()).hexdigest() if query else ""
+        return f"{name}:{vendor_code}:{self._token(cache, vendor_code)}:{etag or ''}:{shape}"
+
+    def get_or_compute(self, name, vendor_code, compute, params=None, etag=None):
+        """
+        Return the cached data of a vendor view, or compute and cache it.
+        A compute() returning None (e.g. unknown vendor) is not cached.
+        """
+        cache = self.cache
+        if cache is None:
+            return compute()
+
+        # The token is read before computing: an invalidation in between
+        # leaves the fresh entry under a token nobody reads anymore
+        key = self.entry_key(cache, name, vendor_code, params, etag)
+        data = cache.get(key, _MISSING)
+        if data is not _MISSING:
+            self._count('hits')
+            return data
+
+        self._count('misses')
+        data, shared = self._flights.do(key, lambda: self._fill(cache, key, compute))
+        if shared:
+            self._count('coalesced')
+        return data
+
+    def _fill(self, cache, key, compute):
+        if not getattr(settings, 'VENDOR_RESPONSE_CACHE_LOCK', False):
+            return self._compute(cache, key, compute)
+
+        lock_key = f"lock:{key}"
+        if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            try:
+                return self._compute(cache, key, compute)
+            finally:
+                cache.delete(lock_key)
+
+        # Another worker is computing the entry: wait for it to show up,
+        # unless that worker gives up (or stores nothing, e.g. a 404)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key, _MISSING)
+            if data is not _MISSING:
+                self._count('coalesced_remote')
+                return data
+            if cache.get(lock_key) is None:
+                break
+        return self._compute(cache, key, compute)
+
+    @staticmethod
+    def _compute(cache, key, compute):
+        data = compute()
+        if data is not None:
+            cache.set(key, data)
+        return data
+
+    def invalidate(self, *vendor_codes):
+        """
+        Drop the cached responses of the given vendors, now and again once the
+        current transaction commits (readers may refill them in between).
+        """
+        cache = self.cache
+        if cache is None or not vendor_codes:
+            return
+
+        keys = [self._token_key(vendor_code) for vendor_code in vendor_codes]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        with self._lock:
+            self.invalidations += len(keys)
+
+    def stats(self):
+        cache = self.cache
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'coalesced_remote': self.coalesced_remote, 'invalidations': self.invalidations,
+                    'evictions': getattr(cache, 'evictions', None)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.coalesced = 0
+            self.coalesced_remote = 0
+            self.invalidations = 0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,62 @@
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def current_version(model, pk):
+    """
+    Return the (version, modified_at) of a row without loading the rest of it,
+    or None when it does not exist.
+    """
+    return model.objects.filter(pk=pk).values_list('version', 'modified_at').first()
+
+
+def conditional_get(model, validate=None):
+    """
+    Decorate the get() of an API view whose detail resource is identified by
+    the `pk` of `model` (or, for nested resources, of its parent).
+
+    The detail response carries an ETag and Last-Modified derived from the
+    row's version and modification time; a matching If-None-Match / If-Modified-Since is answered
+    with 304 before the view queries or serializes anything else.
+
+    `validate(view, request)` checks the query parameters first: the error
+    response it returns, if any, wins over a 304.
+
+    The ETag is also left on the view as `etag` (None when the row does not
+    exist), e.g. to key cached responses by it.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def inner(self, request, pk=None, *args, **kwargs):
+            if validate is not None:
+                error = validate(self, request)
+                if error is not None:
+                    return error
+
+            state = current_version(model, pk) if pk is not None else None
+            if state is None:
+                self.etag = None
+                return func(self, request, pk, *args, **kwargs)
+
+            version, modified_at = state
+            # The modification time tells apart a row deleted and recreated
+            # with the same key, whose version starts over
+            etag = f'W/"{version}-{modified_at.timestamp():.6f}"'
+            last_modified = int(modified_at.timestamp())
+            self.etag = etag
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = func(self, request, pk, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+            return response
+
+        return inner
+
+    return decorator
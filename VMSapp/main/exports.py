@@ -0,0 +1,95 @@
+import csv
+import itertools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import PurchaseOrderModel, HistoricalPerformanceModel
+from .serializers import PurchaseOrderModelSerializer, HistoricalPerformanceModelSerializer, ValuesSerializer
+
+# dataset name -> (model, serializer, date field filtered by since/until)
+EXPORTS = {
+    'purchase_orders': (PurchaseOrderModel, PurchaseOrderModelSerializer, 'issue_date'),
+    'performance': (HistoricalPerformanceModel, HistoricalPerformanceModelSerializer, 'date'),
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows joined into one chunk of the streamed output
+ROWS_PER_WRITE = 500
+
+
+def export_queryset(dataset, filters):
+    """
+    Build the queryset of a dataset for the validated export filters.
+    """
+    model, _, date_field = EXPORTS[dataset]
+    queryset = model.objects.order_by('pk')
+
+    if filters.get('vendor'):
+        queryset = queryset.filter(vendor_id=filters['vendor'])
+    if filters.get('status'):
+        if dataset != 'purchase_orders':
+            raise ValueError("The status filter only applies to purchase orders")
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('since'):
+        queryset = queryset.filter(**{f'{date_field}__gte': filters['since']})
+    if filters.get('until'):
+        queryset = queryset.filter(**{f'{date_field}__lt': filters['until']})
+    return queryset
+
+
+class Echo:
+    """
+    File-like object whose write() hands the written value back, so csv.writer
+    can format a single row without buffering.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _representations(queryset, serializer_class, chunk_size):
+    serializer = ValuesSerializer(serializer_class)
+    rows = serializer.values(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serializer.data(chunk)
+
+
+def stream_rows(dataset, queryset, export_format, chunk_size=2000):
+    """
+    Yield the rows of the queryset as NDJSON or CSV text chunks, reading the
+    database with a server-side iterator so memory use stays constant.
+    """
+    _, serializer_class, _ = EXPORTS[dataset]
+    rows = _representations(queryset, serializer_class, chunk_size)
+
+    if export_format == 'ndjson':
+        lines = (json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+    else:
+        writer = csv.writer(Echo())
+        header = writer.writerow(list(serializer_class().fields))
+        lines = itertools.chain([header], (
+            writer.writerow([json.dumps(value) if isinstance(value, (dict, list)) else value
+                             for value in row.values()])
+            for row in rows
+        ))
+
+    return _batched(lines)
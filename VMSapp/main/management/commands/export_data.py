@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.exports import EXPORTS, export_queryset, stream_rows
+from main.serializers import ExportFilterSerializer
+
+
+class Command(BaseCommand):
+    help = "Stream purchase orders or historical performance records as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='output', choices=ExportFilterSerializer.FORMAT_CHOICES,
+                            default='ndjson')
+        parser.add_argument('--vendor', help="Only export records of the given vendor")
+        parser.add_argument('--status', help="Only export purchase orders with the given status")
+        parser.add_argument('--since', help="Only export records dated (issued) at or after this datetime")
+        parser.add_argument('--until', help="Only export records dated (issued) before this datetime")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Number of rows fetched from the database at a time")
+        parser.add_argument('--output-file', help="Write to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        data = {name: options[name] for name in ('vendor', 'status', 'since', 'until', 'output')
+                if options[name] is not None}
+        filters = ExportFilterSerializer(data=data)
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        try:
+            queryset = export_queryset(options['dataset'], filters.validated_data)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = stream_rows(options['dataset'], queryset, filters.validated_data['output'], options['chunk_size'])
+        if options['output_file']:
+            with open(options['output_file'], 'w', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
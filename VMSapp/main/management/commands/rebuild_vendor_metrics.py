@@ -0,0 +1,143 @@
+import datetime
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from main import metrics
+from main.cache import response_cache
+from main.models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel, VendorMetricsModel
+
+METRIC_FIELDS = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+
+
+def aggregates_for_range(first, last):
+    """
+    Grouped aggregates of every vendor whose code lies in [first, last].
+    Runs in a worker process.
+    """
+    try:
+        return PurchaseOrderModel.objects.filter(vendor_id__gte=first, vendor_id__lte=last).metric_aggregates_by_vendor()
+    finally:
+        connections.close_all()
+
+
+def shard_bounds(vendor_codes, shards):
+    """
+    Split the sorted vendor codes into contiguous (first, last) ranges.
+    """
+    size = math.ceil(len(vendor_codes) / shards)
+    return [(vendor_codes[i], vendor_codes[min(i + size, len(vendor_codes)) - 1])
+            for i in range(0, len(vendor_codes), size)]
+
+
+class Command(BaseCommand):
+    help = "Recompute vendor aggregates, metrics and performance snapshots from the purchase orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', action='append', dest='vendors', metavar='VENDOR_CODE',
+                            help="Only rebuild the given vendor (may be repeated)")
+        parser.add_argument('--since', metavar='DATE',
+                            help="Only rebuild vendors with orders issued, acknowledged or completed since DATE")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of worker processes the vendor key space is sharded across")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of rows per bulk_update/bulk_create statement")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Print the metric changes without writing anything")
+        parser.add_argument('--no-snapshot', action='store_true',
+                            help="Do not record historical performance snapshots for changed vendors")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        vendors = self.select_vendors(options['vendors'], options['since'])
+        vendor_list = list(vendors.only('pk', *METRIC_FIELDS))
+        counters = self.compute_aggregates(vendors, [vendor.pk for vendor in vendor_list], options['workers'])
+
+        changed = []
+        for vendor in vendor_list:
+            new_metrics = metrics.derive_metrics(counters.get(vendor.pk, metrics.EMPTY_AGGREGATES))
+            diff = {name: (getattr(vendor, name), value) for name, value in new_metrics.items()
+                    if getattr(vendor, name) is None or not math.isclose(getattr(vendor, name), value)}
+            if not diff:
+                continue
+
+            changed.append(vendor)
+            if options['dry_run']:
+                for name, (old, new) in diff.items():
+                    self.stdout.write(f"{vendor.pk}: {name} {old} -> {new}")
+            else:
+                for name, value in new_metrics.items():
+                    setattr(vendor, name, value)
+                vendor.bump_version()
+
+        if not options['dry_run']:
+            self.write(vendor_list, changed, counters, options['batch_size'], not options['no_snapshot'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if options['dry_run'] else 'Rebuilt'} {len(vendor_list)} vendor(s), "
+            f"{len(changed)} changed, in {elapsed:.2f}s ({len(vendor_list) / elapsed:.0f} vendors/s)"
+        ))
+
+    def select_vendors(self, vendor_codes, since):
+        vendors = VendorModel.objects.order_by('pk')
+        if vendor_codes:
+            vendors = vendors.filter(pk__in=vendor_codes)
+
+        if since:
+            since_date = parse_datetime(since) or parse_date(since)
+            if since_date is None:
+                raise CommandError(f"Invalid --since value: {since}")
+            if not isinstance(since_date, datetime.datetime):
+                since_date = datetime.datetime.combine(since_date, datetime.time.min)
+            if timezone.is_naive(since_date):
+                since_date = timezone.make_aware(since_date)
+
+            touched = PurchaseOrderModel.objects.filter(
+                Q(issue_date__gte=since_date) | Q(acknowledgement_date__gte=since_date) |
+                Q(completion_date__gte=since_date)
+            ).values('vendor_id')
+            vendors = vendors.filter(pk__in=touched)
+
+        return vendors
+
+    def compute_aggregates(self, vendors, vendor_codes, workers):
+        if workers <= 1 or len(vendor_codes) < workers:
+            return PurchaseOrderModel.objects.filter(vendor__in=vendors).metric_aggregates_by_vendor()
+
+        # Workers open their own database connections
+        connections.close_all()
+        selected = set(vendor_codes)
+        counters = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            bounds = shard_bounds(vendor_codes, workers * 4)
+            for shard in executor.map(aggregates_for_range, *zip(*bounds)):
+                counters.update((code, values) for code, values in shard.items() if code in selected)
+        return counters
+
+    def write(self, vendor_list, changed, counters, batch_size, snapshot):
+        now = timezone.now()
+        aggregates = [VendorMetricsModel(vendor_id=vendor.pk, **counters.get(vendor.pk, metrics.EMPTY_AGGREGATES))
+                      for vendor in vendor_list]
+
+        with transaction.atomic():
+            VendorMetricsModel.objects.bulk_create(
+                aggregates, batch_size=batch_size, update_conflicts=True,
+                unique_fields=['vendor'], update_fields=list(metrics.COUNTERS)
+            )
+            VendorModel.objects.bulk_update(changed, METRIC_FIELDS + VendorModel.VERSION_FIELDS, batch_size=batch_size)
+            response_cache.invalidate(*(vendor.pk for vendor in changed))
+            if snapshot:
+                HistoricalPerformanceModel.objects.bulk_create(
+                    [HistoricalPerformanceModel(vendor=vendor, date=now,
+                                                **{name: getattr(vendor, name) for name in METRIC_FIELDS})
+                     for vendor in changed],
+                    batch_size=batch_size
+                )
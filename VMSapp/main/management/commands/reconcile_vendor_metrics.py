@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import metrics
+
+
+class Command(BaseCommand):
+    help = "Check the incrementally maintained vendor aggregates against a full recompute"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', action='append', dest='vendors', metavar='VENDOR_CODE',
+                            help="Only reconcile the given vendor (may be repeated)")
+        parser.add_argument('--fix', action='store_true',
+                            help="Overwrite mismatching aggregates with the recomputed values")
+
+    def handle(self, *args, **options):
+        mismatches = metrics.reconcile(options['vendors'], fix=options['fix'])
+
+        for vendor_code, name, stored, expected in mismatches:
+            self.stdout.write(f"{vendor_code}: {name} stored={stored} expected={expected}")
+
+        vendors = len({mismatch[0] for mismatch in mismatches})
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All vendor aggregates match a full recompute"))
+        elif options['fix']:
+            self.stdout.write(self.style.WARNING(f"Fixed aggregates of {vendors} vendor(s)"))
+        else:
+            raise CommandError(f"Aggregates of {vendors} vendor(s) do not match a full recompute")
@@ -0,0 +1,167 @@
+import math
+
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import response_cache
+from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel, VendorMetricsModel
+
+COUNTERS = ('issued_count', 'completed_count', 'on_time_count', 'rating_sum', 'rating_count',
+            'response_seconds_sum', 'response_count')
+EMPTY_AGGREGATES = dict.fromkeys(COUNTERS, 0)
+
+
+def contribution(order):
+    """
+    Return the counters a single purchase order adds to its vendor's aggregates.
+    """
+    completed = order.status == "COMPLETED"
+    responded = completed and order.response_seconds is not None
+
+    return {
+        'issued_count': 1,
+        'completed_count': int(completed),
+        'on_time_count': int(completed and bool(order.is_on_time)),
+        'rating_sum': order.quality_rating or 0.0,
+        'rating_count': int(order.quality_rating is not None),
+        'response_seconds_sum': order.response_seconds if responded else 0.0,
+        'response_count': int(responded),
+    }
+
+
+def full_aggregates(vendor_code):
+    """
+    Recompute a vendor's aggregates from scratch by scanning all of its purchase orders.
+    """
+    return PurchaseOrderModel.objects.filter(vendor_id=vendor_code).metric_aggregates()
+
+
+def derive_metrics(counters):
+    """
+    Derive the vendor performance metrics from a set of aggregate counters.
+    """
+    completed = counters['completed_count']
+    issued = counters['issued_count']
+    rated = counters['rating_count']
+    responded = counters['response_count']
+
+    return {
+        'on_time_delivery_rate': counters['on_time_count'] / completed if completed else 0,
+        'quality_rating_avg': counters['rating_sum'] / rated if rated else 0,
+        'average_response_time': round(counters['response_seconds_sum'] / responded / 86400, 2) if responded else 0,
+        'fulfillment_rate': completed / issued if issued else 0,
+    }
+
+
+def rebuild_aggregates(vendor_code):
+    """
+    Overwrite the stored aggregates of a vendor with a full recompute.
+    Vendors that no longer exist (e.g. during a cascading delete) are skipped.
+    """
+    if not VendorModel.objects.filter(pk=vendor_code).exists():
+        return None
+
+    counters = full_aggregates(vendor_code)
+    VendorMetricsModel.objects.update_or_create(vendor_id=vendor_code, defaults=counters)
+    return counters
+
+
+def apply_delta(vendor_code, delta):
+    """
+    Move the stored aggregates of a vendor by the given delta.
+    Returns True when anything changed.
+    """
+    changes = {name: F(name) + value for name, value in delta.items() if value}
+    if not changes:
+        return False
+
+    if not VendorMetricsModel.objects.filter(vendor_id=vendor_code).update(**changes):
+        # No aggregate row yet: the full recompute already includes this change
+        rebuild_aggregates(vendor_code)
+    return True
+
+
+def apply_changes(changes):
+    """
+    Apply the changes of purchase orders from one state to another, summed
+    into one delta per vendor. Each change is a (previous, current) pair of
+    (vendor_code, contribution) states, where None stands for an order that
+    did not exist before / does not exist anymore. Returns the vendor codes
+    whose aggregates moved.
+    """
+    deltas = {}
+    for previous, current in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None:
+                continue
+            vendor_code, counters = state
+            delta = deltas.setdefault(vendor_code, dict.fromkeys(COUNTERS, 0))
+            for name in COUNTERS:
+                delta[name] += sign * counters[name]
+
+    return [vendor_code for vendor_code, delta in deltas.items() if apply_delta(vendor_code, delta)]
+
+
+def apply_change(previous, current):
+    """
+    Apply the change of a single purchase order, see apply_changes().
+    """
+    return apply_changes([(previous, current)])
+
+
+def apply_contributions(orders):
+    """
+    Add the contributions of newly inserted purchase orders, e.g. from
+    bulk_create() which sends no signals. Returns the vendor codes whose
+    aggregates moved.
+    """
+    return apply_changes((None, (order.vendor_id, contribution(order))) for order in orders)
+
+
+def refresh_vendor_metrics(vendor_code, snapshot=False):
+    """
+    Copy the metrics derived from the stored aggregates onto the vendor and,
+    if requested, record them as a historical performance snapshot.
+    """
+    counters = VendorMetricsModel.objects.filter(vendor_id=vendor_code).values(*COUNTERS).first()
+    if counters is None:
+        return None
+
+    metrics = derive_metrics(counters)
+    VendorModel.objects.filter(pk=vendor_code).update(**metrics, **VendorModel.next_version())
+    response_cache.invalidate(vendor_code)
+
+    if snapshot:
+        HistoricalPerformanceModel.objects.create(vendor_id=vendor_code, date=timezone.now(), **metrics)
+    return metrics
+
+
+def reconcile(vendor_codes=None, fix=False):
+    """
+    Compare the incrementally maintained aggregates with a full recompute.
+    Returns a list of (vendor_code, counter, stored, expected) mismatches; with
+    fix=True the stored aggregates and vendor metrics are corrected as well.
+    """
+    vendors = VendorModel.objects.order_by('pk')
+    if vendor_codes:
+        vendors = vendors.filter(pk__in=vendor_codes)
+    stored = {row['vendor_id']: row for row in
+              VendorMetricsModel.objects.filter(vendor__in=vendors).values('vendor_id', *COUNTERS)}
+
+    computed = PurchaseOrderModel.objects.filter(vendor__in=vendors).metric_aggregates_by_vendor()
+
+    mismatches = []
+    for vendor_code in vendors.values_list('pk', flat=True):
+        expected = computed.get(vendor_code, EMPTY_AGGREGATES)
+        current = stored.get(vendor_code, EMPTY_AGGREGATES)
+
+        vendor_mismatches = [
+            (vendor_code, name, current[name], expected[name]) for name in COUNTERS
+            if not math.isclose(current[name], expected[name], abs_tol=1e-6)
+        ]
+        if vendor_mismatches and fix:
+            VendorMetricsModel.objects.update_or_create(vendor_id=vendor_code, defaults=expected)
+            refresh_vendor_metrics(vendor_code)
+        mismatches.extend(vendor_mismatches)
+
+    return mismatches
@@ -0,0 +1,15 @@
+from .recompute import recompute_queue
+
+
+class VendorMetricsBatchMiddleware:
+    """
+    Coalesce the vendor metric recomputes triggered while handling a request,
+    so each affected vendor is recomputed once when the response is ready.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with recompute_queue.batch():
+            return self.get_response(request)
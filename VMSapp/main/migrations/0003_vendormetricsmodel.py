@@ -0,0 +1,76 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+
+def backfill_vendor_metrics(apps, schema_editor):
+    VendorModel = apps.get_model("main", "VendorModel")
+    PurchaseOrderModel = apps.get_model("main", "PurchaseOrderModel")
+    VendorMetricsModel = apps.get_model("main", "VendorMetricsModel")
+
+    completed = Q(status="COMPLETED")
+    responded = completed & Q(acknowledgement_date__isnull=False)
+    for vendor_code in VendorModel.objects.values_list("pk", flat=True):
+        counters = PurchaseOrderModel.objects.filter(vendor_id=vendor_code).aggregate(
+            issued_count=Count("pk"),
+            completed_count=Count("pk", filter=completed),
+            on_time_count=Count(
+                "pk", filter=completed & Q(completion_date__lte=F("delivery_date"))
+            ),
+            rating_sum=Sum("quality_rating"),
+            rating_count=Count("quality_rating"),
+            response_seconds_sum=Sum(
+                ExpressionWrapper(
+                    F("acknowledgement_date") - F("issue_date"),
+                    output_field=DurationField(),
+                ),
+                filter=responded,
+            ),
+            response_count=Count("pk", filter=responded),
+        )
+        counters["rating_sum"] = counters["rating_sum"] or 0.0
+        counters["response_seconds_sum"] = (
+            counters["response_seconds_sum"].total_seconds()
+            if counters["response_seconds_sum"]
+            else 0.0
+        )
+        VendorMetricsModel.objects.create(vendor_id=vendor_code, **counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0002_purchaseordermodel_completion_date_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendorMetricsModel",
+            fields=[
+                (
+                    "vendor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="metrics",
+                        serialize=False,
+                        to="main.vendormodel",
+                    ),
+                ),
+                ("issued_count", models.PositiveIntegerField(default=0)),
+                ("completed_count", models.PositiveIntegerField(default=0)),
+                ("on_time_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.FloatField(default=0.0)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("response_seconds_sum", models.FloatField(default=0.0)),
+                ("response_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Vendor Metrics",
+                "verbose_name_plural": "Vendor Metrics",
+            },
+        ),
+        migrations.RunPython(backfill_vendor_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_derived_fields(apps, schema_editor):
+    PurchaseOrderModel = apps.get_model("main", "PurchaseOrderModel")
+    orders = PurchaseOrderModel.objects.order_by("pk").only(
+        "pk",
+        "status",
+        "delivery_date",
+        "issue_date",
+        "acknowledgement_date",
+        "completion_date",
+    )
+
+    # Walk the table by primary key in chunks so each UPDATE batch stays small
+    last_pk = None
+    while True:
+        chunk = orders.filter(pk__gt=last_pk) if last_pk is not None else orders
+        chunk = list(chunk[:BACKFILL_CHUNK_SIZE])
+        if not chunk:
+            break
+
+        for order in chunk:
+            if order.status == "COMPLETED":
+                order.is_on_time = (
+                    order.completion_date is not None
+                    and order.completion_date <= order.delivery_date
+                )
+            if order.acknowledgement_date:
+                order.response_seconds = (
+                    order.acknowledgement_date - order.issue_date
+                ).total_seconds()
+        PurchaseOrderModel.objects.bulk_update(
+            chunk, ["is_on_time", "response_seconds"]
+        )
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0003_vendormetricsmodel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseordermodel",
+            name="is_on_time",
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="purchaseordermodel",
+            name="response_seconds",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_derived_fields, migrations.RunPython.noop),
+    ]
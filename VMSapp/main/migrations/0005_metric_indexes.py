@@ -0,0 +1,37 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0004_purchaseordermodel_derived_metric_fields"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="historicalperformancemodel",
+            index=models.Index(fields=["vendor", "date"], name="perf_vendor_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseordermodel",
+            index=models.Index(
+                fields=[
+                    "vendor",
+                    "status",
+                    "is_on_time",
+                    "response_seconds",
+                    "quality_rating",
+                ],
+                name="po_vendor_metrics_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseordermodel",
+            index=models.Index(
+                fields=["vendor", "status", "completion_date"],
+                name="po_vendor_status_done_idx",
+            ),
+        ),
+    ]
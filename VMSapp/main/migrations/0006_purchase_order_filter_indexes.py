@@ -0,0 +1,24 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0005_metric_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="purchaseordermodel",
+            index=models.Index(
+                fields=["vendor", "status", "delivery_date"],
+                name="po_vendor_status_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseordermodel",
+            index=models.Index(fields=["issue_date"], name="po_issue_date_idx"),
+        ),
+    ]
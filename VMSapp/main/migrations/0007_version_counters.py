@@ -0,0 +1,38 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0006_purchase_order_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseordermodel",
+            name="modified_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="purchaseordermodel",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="vendormodel",
+            name="modified_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="vendormodel",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,9 +1,48 @@
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.db.models import Count, F, Q, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .cache import response_cache
+
+# Sent with the stored metric fields (`rows`) of deleted purchase orders.
+# Deletes send it instead of post_delete, whose receivers would keep a vendor's
+# deletion from removing its purchase orders with a single fast DELETE
+purchase_orders_deleted = Signal()
+
 
 # Create your models here.
-class VendorModel(models.Model):
+class VersionedModel(models.Model):
+    """
+    Adds a version counter and modification time, bumped on every write, from
+    which the detail endpoints derive their ETag and Last-Modified headers.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+    modified_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    # Fields the API serializers leave out
+    VERSION_FIELDS = ('version', 'modified_at')
+
+    def bump_version(self):
+        """
+        Prepare the next save() to increment the version in the database.
+        """
+        self.version = 1 if self._state.adding else F('version') + 1
+        self.modified_at = timezone.now()
+
+    @staticmethod
+    def next_version():
+        """
+        Field values that bump the version of every row of a queryset update().
+        """
+        return {'version': F('version') + 1, 'modified_at': timezone.now()}
+
+    class Meta:
+        abstract = True
+
+
+class VendorModel(VersionedModel):
     vendor_code = models.CharField(max_length=10, primary_key=True)
     name = models.CharField(max_length=50)
     contact_details = models.CharField(max_length=50, blank=True)
@@ -21,7 +60,47 @@ class VendorModel(models.Model):
         verbose_name_plural = "Vendors"
 
 
-class PurchaseOrderModel(models.Model):
+class PurchaseOrderQuerySet(models.QuerySet):
+    @staticmethod
+    def _metric_aggregates():
+        completed = Q(status="COMPLETED")
+        return {
+            'issued_count': Count('pk'),
+            'completed_count': Count('pk', filter=completed),
+            'on_time_count': Count('pk', filter=completed & Q(is_on_time=True)),
+            'rating_sum': Sum('quality_rating', default=0.0),
+            'rating_count': Count('quality_rating'),
+            'response_seconds_sum': Sum('response_seconds', filter=completed, default=0.0),
+            'response_count': Count('response_seconds', filter=completed),
+        }
+
+    def metric_aggregates(self):
+        """
+        Compute the vendor metric counters over the orders in this queryset
+        with a single conditional-aggregation query.
+        """
+        return self.aggregate(**self._metric_aggregates())
+
+    def metric_aggregates_by_vendor(self):
+        """
+        Same as metric_aggregates(), grouped by vendor in one query.
+        Returns a dict keyed by vendor_code.
+        """
+        rows = self.order_by().values('vendor_id').annotate(**self._metric_aggregates())
+        return {row.pop('vendor_id'): row for row in rows}
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(self.values(*self.model.METRIC_FIELDS))
+            result = super().delete()
+            purchase_orders_deleted.send(sender=self.model, rows=rows)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class PurchaseOrderModel(VersionedModel):
     STATUS_CHOICES = (('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('CANCELED', 'Canceled'))
 
     po_number = models.CharField(max_length=10, primary_key=True)
@@ -36,13 +115,116 @@ class PurchaseOrderModel(models.Model):
     issue_date = models.DateTimeField(auto_now=False, auto_now_add=False)
     acknowledgement_date = models.DateTimeField(auto_now=False, auto_now_add=False, null=True, blank=True)
     completion_date = models.DateTimeField(auto_now=False, auto_now_add=False, null=True, blank=True)
+    # Derived when the order is saved, so vendor metrics are plain counts and sums
+    is_on_time = models.BooleanField(null=True, blank=True, editable=False)
+    response_seconds = models.FloatField(null=True, blank=True, editable=False)
+
+    objects = PurchaseOrderQuerySet.as_manager()
+
+    # Fields the vendor performance metrics depend on
+    METRIC_FIELDS = ('vendor_id', 'status', 'quality_rating', 'issue_date', 'acknowledgement_date',
+                     'delivery_date', 'completion_date', 'is_on_time', 'response_seconds')
 
     def __str__(self):
         return f"Order ID: {self.po_number} for (Vendor: {self.vendor.vendor_code})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_metric_fields()
+        return instance
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or self._state.db
+        with transaction.atomic(using=using, savepoint=False):
+            rows = [self.metric_snapshot] if self.metric_snapshot is not None else \
+                list(type(self).objects.using(using).filter(pk=self.pk).values(*self.METRIC_FIELDS))
+            result = super().delete(using=using, keep_parents=keep_parents)
+            purchase_orders_deleted.send(sender=type(self), rows=rows)
+        return result
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            self.snapshot_metric_fields()
+        elif self.metric_snapshot is not None:
+            for name in fields:
+                attname = self._meta.get_field(name).attname
+                if attname in self.METRIC_FIELDS:
+                    self.metric_snapshot[attname] = getattr(self, attname)
+
+    def stamp_completion(self, previous_status=None):
+        """
+        Record the completion time on the transition to COMPLETED.
+        """
+        if self.status == "COMPLETED" and previous_status != "COMPLETED":
+            self.completion_date = timezone.now()
+
+    def set_derived_fields(self):
+        """
+        Derive whether the order was completed on time and how long the vendor
+        took to acknowledge it.
+        """
+        if self.status == "COMPLETED":
+            self.is_on_time = self.completion_date is not None and self.completion_date <= self.delivery_date
+        else:
+            self.is_on_time = None
+        self.response_seconds = (self.acknowledgement_date - self.issue_date).total_seconds() \
+            if self.acknowledgement_date else None
+
+    def snapshot_metric_fields(self):
+        """
+        Remember the stored values of the metric fields so that a later save
+        can tell whether anything metric-relevant changed.
+        """
+        if self.get_deferred_fields().intersection(self.METRIC_FIELDS):
+            self._metric_snapshot = None
+        else:
+            self._metric_snapshot = {name: getattr(self, name) for name in self.METRIC_FIELDS}
+
+    @property
+    def metric_snapshot(self):
+        return getattr(self, '_metric_snapshot', None)
+
+    def changed_metric_fields(self):
+        """
+        Return the metric fields whose value differs from the stored row.
+        Without a snapshot every metric field is considered changed.
+        """
+        if self.metric_snapshot is None:
+            return set(self.METRIC_FIELDS)
+        return {name for name in self.METRIC_FIELDS if getattr(self, name) != self.metric_snapshot[name]}
+
     class Meta:
         verbose_name = "Purchase Order"
         verbose_name_plural = "Purchase Orders"
+        indexes = [
+            # Metric aggregates: index-only counts and sums per vendor
+            models.Index(fields=['vendor', 'status', 'is_on_time', 'response_seconds', 'quality_rating'],
+                         name='po_vendor_metrics_idx'),
+            # Completed orders of a vendor by completion date
+            models.Index(fields=['vendor', 'status', 'completion_date'], name='po_vendor_status_done_idx'),
+            # Purchase order list filters
+            models.Index(fields=['vendor', 'status', 'delivery_date'], name='po_vendor_status_due_idx'),
+            models.Index(fields=['issue_date'], name='po_issue_date_idx'),
+        ]
+
+
+class HistoricalPerformanceQuerySet(models.QuerySet):
+    def delete(self):
+        # Not a post_delete receiver, which would keep a vendor's deletion from
+        # removing its history with a single fast DELETE (the vendor's own
+        # post_delete drops its cached responses)
+        with transaction.atomic(using=self.db, savepoint=False):
+            vendor_codes = set(self.values_list('vendor_id', flat=True))
+            result = super().delete()
+            # The performance endpoint's ETag is the vendor's version
+            VendorModel.objects.using(self.db).filter(pk__in=vendor_codes).update(**VendorModel.next_version())
+        response_cache.invalidate(*vendor_codes)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 class HistoricalPerformanceModel(models.Model):
@@ -54,6 +236,44 @@ class HistoricalPerformanceModel(models.Model):
     average_response_time = models.FloatField(null=True, blank=True)
     fulfillment_rate = models.FloatField(null=True, blank=True)
 
+    objects = HistoricalPerformanceQuerySet.as_manager()
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or self._state.db
+        with transaction.atomic(using=using, savepoint=False):
+            result = super().delete(using=using, keep_parents=keep_parents)
+            # The performance endpoint's ETag is the vendor's version
+            VendorModel.objects.using(using).filter(pk=self.vendor_id).update(**VendorModel.next_version())
+        response_cache.invalidate(self.vendor_id)
+        return result
+
     class Meta:
         verbose_name = "Historical Performance"
         verbose_name_plural = "Historical Performance"
+        indexes = [
+            models.Index(fields=['vendor', 'date'], name='perf_vendor_date_idx'),
+        ]
+
+
+class VendorMetricsModel(models.Model):
+    """
+    Running aggregates of a vendor's purchase orders. The counters are moved by
+    deltas whenever a purchase order changes, so the vendor's performance metrics
+    can be derived without scanning its order history.
+    """
+    vendor = models.OneToOneField(VendorModel, on_delete=models.CASCADE, primary_key=True,
+                                  related_name="metrics")
+    issued_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    on_time_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)
+    rating_count = models.PositiveIntegerField(default=0)
+    response_seconds_sum = models.FloatField(default=0.0)
+    response_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Metrics for {self.vendor_id}"
+
+    class Meta:
+        verbose_name = "Vendor Metrics"
+        verbose_name_plural = "Vendor Metrics"
@@ -0,0 +1,25 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a unique, indexed ordering: every page is an index
+    range scan of constant cost, however deep the client pages.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    # ?paginate=false returns the whole (unbounded) list as before
+    paginate_query_param = 'paginate'
+
+    def wants_full_list(self, request):
+        return request.query_params.get(self.paginate_query_param, '').lower() in ('false', '0', 'no')
+
+
+class VendorPagination(KeysetPagination):
+    ordering = 'vendor_code'
+
+
+class PurchaseOrderPagination(KeysetPagination):
+    ordering = 'po_number'
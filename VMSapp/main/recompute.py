@@ -0,0 +1,157 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import metrics
+
+MODES = ('sync', 'deferred', 'background')
+
+
+class RecomputeQueue:
+    """
+    Collects vendor metric recompute requests and runs each vendor at most once
+    per transaction (or per batch(), e.g. one HTTP request).
+
+    Modes, selected with the VENDOR_METRICS_RECOMPUTE setting:
+    - sync: recompute immediately, inside the caller (used by tests)
+    - deferred: recompute once per vendor after the transaction commits
+    - background: like deferred, but on a local worker thread
+
+    Outside sync mode, a request is only queued once the transaction (or
+    savepoint) that made it commits, so rolled back changes recompute nothing.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.reset_stats()
+
+    @property
+    def mode(self):
+        mode = getattr(settings, 'VENDOR_METRICS_RECOMPUTE', 'deferred')
+        if mode not in MODES:
+            raise ValueError(f"VENDOR_METRICS_RECOMPUTE must be one of {MODES}, not {mode!r}")
+        return mode
+
+    def _state(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = {}
+            self._local.depth = 0
+            self._local.scheduled = 0
+        return self._local
+
+    def request(self, vendor_code, snapshot=False):
+        """
+        Ask for the metrics of a vendor to be recomputed (and optionally
+        recorded as a historical snapshot).
+        """
+        with self._lock:
+            self.requested += 1
+
+        if self.mode == 'sync':
+            self._run({vendor_code: snapshot})
+            return
+
+        transaction.on_commit(partial(self._enqueue, vendor_code, snapshot))
+        if self._state().depth == 0:
+            self._schedule_flush()
+
+    def _enqueue(self, vendor_code, snapshot):
+        state = self._state()
+        if vendor_code in state.pending:
+            with self._lock:
+                self.coalesced += 1
+        state.pending[vendor_code] = state.pending.get(vendor_code, False) or snapshot
+
+    def _schedule_flush(self):
+        """
+        Flush once the current transaction commits, after all of its requests
+        are queued.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            transaction.on_commit(self.flush)
+            return
+
+        # Every call adds a flush, and only the last one added runs, once the
+        # requests of the whole transaction are queued. They are registered
+        # outside of any savepoint (which on_commit() cannot do), so that the
+        # last one survives the rollback of a savepoint and the committed
+        # requests are not stranded.
+        state = self._state()
+        state.scheduled += 1
+        connection.run_on_commit.append((set(), partial(self._flush_scheduled, state.scheduled), False))
+
+    def _flush_scheduled(self, scheduled):
+        if scheduled == self._state().scheduled:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """
+        Hold back recomputes until the outermost batch exits.
+        """
+        state = self._state()
+        state.depth += 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            # Registered even with nothing queued yet: the requests of the
+            # batch are queued as their transactions commit
+            if state.depth == 0:
+                self._schedule_flush()
+
+    def flush(self):
+        state = self._state()
+        pending, state.pending = state.pending, {}
+        if not pending:
+            return
+
+        if self.mode == 'background':
+            self._get_executor().submit(self._run_in_worker, pending)
+        else:
+            self._run(pending)
+
+    def _run(self, pending):
+        for vendor_code, snapshot in pending.items():
+            metrics.refresh_vendor_metrics(vendor_code, snapshot=snapshot)
+        with self._lock:
+            self.executed += len(pending)
+
+    def _run_in_worker(self, pending):
+        try:
+            self._run(pending)
+        finally:
+            connections.close_all()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vendor-metrics")
+            return self._executor
+
+    def wait(self):
+        """
+        Block until the background worker has finished all submitted recomputes.
+        """
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result()
+
+    def stats(self):
+        with self._lock:
+            return {'requested': self.requested, 'executed': self.executed, 'coalesced': self.coalesced}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requested = 0
+            self.executed = 0
+            self.coalesced = 0
+
+
+recompute_queue = RecomputeQueue()
@@ -1,14 +1,52 @@
 import re
 
-from rest_framework import serializers
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
 
 
-class VendorModelSerializer(serializers.ModelSerializer):
+def parse_fieldset(query_params, field_names):
+    """
+    Return the field names selected with the comma separated ?fields= and
+    ?exclude= query parameters, in serializer order, or None when neither is
+    given.
+    """
+    include = query_params.get('fields')
+    exclude = query_params.get('exclude')
+    if not include and not exclude:
+        return None
+
+    selected = [name.strip() for name in include.split(',')] if include else list(field_names)
+    excluded = [name.strip() for name in exclude.split(',')] if exclude else []
+    unknown = [name for name in selected + excluded if name not in field_names]
+    if unknown:
+        raise serializers.ValidationError({'fields': [f"Unknown field(s): {', '.join(unknown)}."]})
+
+    fieldset = [name for name in field_names if name in selected and name not in excluded]
+    if not fieldset:
+        raise serializers.ValidationError({'fields': ["No fields selected."]})
+    return fieldset
+
+
+class FieldsetMixin:
+    """
+    Lets a serializer be restricted to some of its fields with fields=[...].
+    """
+
+    def __init__(self, *args, **kwargs):
+        fieldset = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fieldset is not None:
+            for name in set(self.fields) - set(fieldset):
+                self.fields.pop(name)
+
+
+class VendorModelSerializer(FieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = VendorModel
-        fields = "__all__"
+        exclude = VendorModel.VERSION_FIELDS
 
     # Validations
 
@@ -62,13 +100,214 @@ class VendorModelSerializer(serializers.ModelSerializer):
         return value
 
 
-class PurchaseOrderModelSerializer(serializers.ModelSerializer):
+class VendorBulkSerializer(VendorModelSerializer):
+    """
+    Row serializer of the bulk upsert endpoint. The performance metrics are
+    derived from the purchase orders, so only the profile fields are taken
+    from the request; vendor_code uniqueness is resolved by the upsert itself.
+    """
+    PROFILE_FIELDS = ('name', 'contact_details', 'address')
+
+    class Meta(VendorModelSerializer.Meta):
+        read_only_fields = ('on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate')
+        extra_kwargs = {'vendor_code': {'validators': []}}
+
+
+class PurchaseOrderModelSerializer(FieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrderModel
-        fields = "__all__"
+        exclude = PurchaseOrderModel.VERSION_FIELDS
+
+
+class PurchaseOrderBulkSerializer(PurchaseOrderModelSerializer):
+    """
+    Row serializer of the bulk create endpoint. Uniqueness of po_number and
+    existence of the vendor are checked once for the whole batch instead of
+    with one query per row.
+    """
+    vendor = serializers.CharField(max_length=10, source='vendor_id')
+
+    class Meta(PurchaseOrderModelSerializer.Meta):
+        extra_kwargs = {'po_number': {'validators': []}}
+
+
+class VendorBatchSerializer(serializers.Serializer):
+    vendor_codes = serializers.ListField(child=serializers.CharField(max_length=10), allow_empty=False,
+                                         max_length=1000)
+    include_performance = serializers.BooleanField(default=False)
+
+
+class BulkAcknowledgeSerializer(serializers.Serializer):
+    po_numbers = serializers.ListField(child=serializers.CharField(max_length=10), allow_empty=False,
+                                       max_length=10000)
 
 
 class HistoricalPerformanceModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = HistoricalPerformanceModel
         fields = "__all__"
+
+
+class PurchaseOrderFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the purchase order list and translates
+    them into (indexed) ORM filters.
+    """
+    DATE_RANGE_FIELDS = ('issue_date', 'delivery_date', 'completion_date')
+
+    vendor = serializers.CharField(required=False, max_length=10)
+    status = serializers.ChoiceField(choices=PurchaseOrderModel.STATUS_CHOICES, required=False)
+    issue_date_after = serializers.DateTimeField(required=False)
+    issue_date_before = serializers.DateTimeField(required=False)
+    delivery_date_after = serializers.DateTimeField(required=False)
+    delivery_date_before = serializers.DateTimeField(required=False)
+    completion_date_after = serializers.DateTimeField(required=False)
+    completion_date_before = serializers.DateTimeField(required=False)
+    acknowledged = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        for name in self.DATE_RANGE_FIELDS:
+            after, before = attrs.get(f'{name}_after'), attrs.get(f'{name}_before')
+            if after and before and after >= before:
+                raise serializers.ValidationError(f"'{name}_after' must be earlier than '{name}_before'.")
+        return attrs
+
+    def get_filters(self):
+        """
+        Return the ORM lookups for the validated parameters:
+        *_after is inclusive, *_before exclusive.
+        """
+        data = self.validated_data
+        filters = {}
+        if data.get('vendor'):
+            filters['vendor_id'] = data['vendor']
+        if data.get('status'):
+            filters['status'] = data['status']
+        for name in self.DATE_RANGE_FIELDS:
+            if data.get(f'{name}_after'):
+                filters[f'{name}__gte'] = data[f'{name}_after']
+            if data.get(f'{name}_before'):
+                filters[f'{name}__lt'] = data[f'{name}_before']
+        if data.get('acknowledged') is not None:
+            filters['acknowledgement_date__isnull'] = not data['acknowledged']
+        return filters
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    """
+    Validates the filters of the streaming exports.
+    """
+    FORMAT_CHOICES = ('ndjson', 'csv')
+
+    vendor = serializers.CharField(required=False, max_length=10)
+    status = serializers.ChoiceField(choices=PurchaseOrderModel.STATUS_CHOICES, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    output = serializers.ChoiceField(choices=FORMAT_CHOICES, default='ndjson')
+
+    def validate(self, attrs):
+        if attrs.get('since') and attrs.get('until') and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("'since' must be earlier than 'until'.")
+        return attrs
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path of a ModelSerializer for lists: rows are fetched with
+    .values() and turned into the same dicts the serializer would produce,
+    without model instances or per-field method dispatch. Fields of a type
+    without a fast conversion fall back to the serializer field itself.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def fields(self):
+        return [field for field in self.serializer_class().fields.values() if not field.write_only]
+
+    @property
+    def field_names(self):
+        return [field.field_name for field in self.fields]
+
+    @property
+    def sources(self):
+        return [field.source for field in self.fields]
+
+    def subset(self, field_names):
+        """
+        Return a ValuesSerializer limited to the given fields (all if None).
+        """
+        if field_names is None:
+            return self
+        subset = ValuesSerializer(self.serializer_class)
+        subset.__dict__['fields'] = [field for field in self.fields if field.field_name in field_names]
+        return subset
+
+    def values(self, queryset, *extra):
+        """
+        Restrict a queryset to the columns of the serializer (plus `extra`
+        ones, e.g. the pagination ordering), as dict rows.
+        """
+        return queryset.values(*dict.fromkeys([*self.sources, *extra]))
+
+    def data(self, rows):
+        """
+        Return the representations of the given .values() rows.
+        """
+        columns = [(field.field_name, field.source, self.converter(field)) for field in self.fields]
+        return [
+            {name: None if row[source] is None else convert(row[source]) for name, source, convert in columns}
+            for row in rows
+        ]
+
+    @staticmethod
+    def converter(field):
+        """
+        Return a function equivalent to field.to_representation() for the
+        non-null values the database returns.
+        """
+        if isinstance(field, serializers.DateTimeField):
+            return _datetime_converter(field)
+        if isinstance(field, serializers.ChoiceField):
+            choices = field.choice_strings_to_values
+            return lambda value: choices.get(str(value), value)
+        if isinstance(field, serializers.BooleanField):
+            return bool
+        if isinstance(field, serializers.FloatField):
+            return float
+        if isinstance(field, serializers.IntegerField):
+            return int
+        if isinstance(field, serializers.CharField):
+            return str
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            # .values() already returns the primary key of the related row
+            return _identity
+        if isinstance(field, serializers.JSONField) and not field.binary:
+            return _identity
+        return field.to_representation
+
+
+def _identity(value):
+    return value
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return _identity
+    if output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+    def convert(value):
+        if field_timezone is None or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return convert
+
@@ -1,99 +1,87 @@
-from django.db.models.functions import Cast
-from django.db.models.signals import post_save
+from types import SimpleNamespace
+
+from django.db.models.expressions import Combinable
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from django.db.models import Avg, ExpressionWrapper, F, fields
 
-from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
+from . import metrics
+from .cache import response_cache
+from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel, purchase_orders_deleted
+from .recompute import recompute_queue
 
 
-def response_time(instance):
-    vendor = instance.vendor
+def stored_state(instance):
+    """
+    Return the stored metric fields of a purchase order, or None for a new one.
+    Falls back to the database only when the instance carries no snapshot
+    (new instances, or ones loaded with deferred metric fields).
+    """
+    if instance.metric_snapshot is not None:
+        return instance.metric_snapshot
+    if instance._state.adding and instance.pk is None:
+        return None
+    return PurchaseOrderModel.objects.filter(pk=instance.pk).values(*PurchaseOrderModel.METRIC_FIELDS).first()
 
-    # Average Response Time
-    avg_time_difference_seconds = PurchaseOrderModel.objects.filter(
-        vendor=vendor, status="COMPLETED"
-    ).aggregate(
-        avg_time_difference_seconds=Avg(
-            Cast(F('acknowledgement_date') - F('issue_date'), fields.FloatField())
-        )
-    )['avg_time_difference_seconds']
-    average_time_difference_seconds = round(avg_time_difference_seconds / 86400, 2) if avg_time_difference_seconds else 0
 
-    # Update or create VendorModel
-    inst_vendor, created = VendorModel.objects.get_or_create(vendor_code=instance.vendor.vendor_code)
-    inst_vendor.average_response_time = average_time_difference_seconds
-    inst_vendor.save()
+# Every saved vendor profile or purchase order gets a new version (and so a new ETag)
+@receiver(pre_save, sender=VendorModel)
+@receiver(pre_save, sender=PurchaseOrderModel)
+def bump_version(sender, instance, **kwargs):
+    instance.bump_version()
 
 
+@receiver(post_save, sender=VendorModel)
 @receiver(post_save, sender=PurchaseOrderModel)
-def calculate_average_response_time(sender, instance, **kwargs):
-    if instance.pk:
-        if instance.acknowledgement_date:
-            response_time(instance)
+def forget_version(sender, instance, **kwargs):
+    # The version was written as F('version') + 1: reload the number, so that
+    # the next save() of the same instance writes the version again (a
+    # deferred field would be left out of the UPDATE)
+    if isinstance(instance.version, Combinable):
+        instance.refresh_from_db(fields=['version'])
+
+
+# Cached vendor detail and performance responses
+@receiver(post_save, sender=VendorModel)
+@receiver(post_delete, sender=VendorModel)
+def invalidate_vendor_responses(sender, instance, **kwargs):
+    response_cache.invalidate(instance.pk)
+
+
+# New snapshots; deleted ones are handled by HistoricalPerformanceModel.delete()
+@receiver(post_save, sender=HistoricalPerformanceModel)
+def invalidate_performance_responses(sender, instance, **kwargs):
+    response_cache.invalidate(instance.vendor_id)
+
+
+# Stamp completion on the transition to COMPLETED, derive the per-order metric columns
+# and remember the previous contribution
+@receiver(pre_save, sender=PurchaseOrderModel)
+def track_metric_transition(sender, instance, **kwargs):
+    previous = stored_state(instance)
+
+    instance.stamp_completion(previous['status'] if previous else None)
+    instance.set_derived_fields()
+
+    instance._previous_contribution = \
+        (previous['vendor_id'], metrics.contribution(SimpleNamespace(**previous))) if previous else None
 
 
 # Performance Metrics calculation
 @receiver(post_save, sender=PurchaseOrderModel)
 def calculate_performance_metrics(sender, instance, created, **kwargs):
-    if instance.status == "COMPLETED":
-        vendor = instance.vendor
-
-        # Update completion time
-        instance.completion_date = timezone.now()
-        instance.save()
-
-        # On-time Delivery Rate
-        completed_pos_count = PurchaseOrderModel.objects.filter(
-            vendor=vendor,
-            status='COMPLETED',
-            completion_date__lte=instance.delivery_date
-        ).count()
-        total_completed_pos_count = PurchaseOrderModel.objects.filter(vendor=vendor, status="COMPLETED").count()
-        on_time_delivery_rate = completed_pos_count / total_completed_pos_count if total_completed_pos_count else total_completed_pos_count
-
-        # Quality Rating Average
-        rating_avg = PurchaseOrderModel.objects.filter(vendor=vendor).aggregate(
-            average_rating=Avg('quality_rating', default=0)
-        )['average_rating']
-
-        # Average Response Time
-        avg_time_difference_seconds = PurchaseOrderModel.objects.filter(
-            vendor=vendor, status="COMPLETED"
-        ).aggregate(
-            avg_time_difference_seconds=Avg(
-                Cast(F('acknowledgement_date') - F('issue_date'), fields.FloatField())
-            )
-        )['avg_time_difference_seconds']
-        average_time_difference_seconds = round(avg_time_difference_seconds / 86400, 2) if avg_time_difference_seconds else 0
-
-        # Fulfillment Rate
-        num_pos_completed = PurchaseOrderModel.objects.filter(vendor=vendor, status="COMPLETED").count()
-        num_pos_issued = PurchaseOrderModel.objects.filter(vendor=vendor).count()
-        fulfill_rate = num_pos_completed / num_pos_issued if num_pos_issued else 0
-
-        # Update or create HistoricalPerformanceModel record
-        record, _ = HistoricalPerformanceModel.objects.get_or_create(
-            vendor=instance.vendor,
-            date=timezone.now(),
-            defaults={
-                'on_time_delivery_rate': on_time_delivery_rate,
-                'quality_rating_avg': rating_avg,
-                'average_response_time': average_time_difference_seconds,
-                'fulfillment_rate': fulfill_rate
-            }
-        )
-        if not _:
-            record.on_time_delivery_rate = on_time_delivery_rate
-            record.quality_rating_avg = rating_avg
-            record.average_response_time = average_time_difference_seconds
-            record.fulfillment_rate = fulfill_rate
-            record.save()
-
-        # Update VendorModel
-        inst_vendor, _ = VendorModel.objects.get_or_create(vendor_code=instance.vendor.vendor_code)
-        inst_vendor.on_time_delivery_rate = on_time_delivery_rate
-        inst_vendor.quality_rating_avg = rating_avg
-        inst_vendor.average_response_time = average_time_difference_seconds
-        inst_vendor.fulfillment_rate = fulfill_rate
-        inst_vendor.save()
+    # Saves that only touch e.g. items or quantity need no metric work
+    if created or instance.changed_metric_fields():
+        current = (instance.vendor_id, metrics.contribution(instance))
+        for vendor_code in metrics.apply_change(instance._previous_contribution, current):
+            recompute_queue.request(vendor_code, snapshot=instance.status == "COMPLETED")
+
+    instance.snapshot_metric_fields()
+
+
+# Deleted orders (other than by the cascade of their vendor's deletion, which
+# takes the vendor's aggregates with it) leave their vendor's aggregates
+@receiver(purchase_orders_deleted)
+def remove_from_performance_metrics(sender, rows, **kwargs):
+    changes = [((stored['vendor_id'], metrics.contribution(SimpleNamespace(**stored))), None) for stored in rows]
+    for vendor_code in metrics.apply_changes(changes):
+        recompute_queue.request(vendor_code)
@@ -1,15 +1,44 @@
+from django.conf import settings
 from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
-from rest_framework.authtoken.models import Token
+from authentication.models import AuthToken
 from rest_framework.test import APITestCase, APIClient
+from django.db import connection, transaction, IntegrityError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from faker import Faker
+import csv
 import datetime
+import decimal
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO, StringIO
+from unittest import mock
 
 from authentication.models import CustomUser
-from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
+from . import metrics
+from .backends.sqlite3.base import DatabaseWrapper
+from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel, VendorMetricsModel
+from .cache import response_cache
+from .recompute import recompute_queue
+from .renderers import FastJSONRenderer, FastJSONParser
+from .serializers import VendorModelSerializer, PurchaseOrderModelSerializer, \
+    HistoricalPerformanceModelSerializer, ValuesSerializer
+from .throttling import TokenBucketThrottle, throttle_stats
+from .views import VendorAPIView, PurchaseOrderAPIView, PerformanceDataAPIView
 
 
 # Create your tests here.
@@ -26,7 +55,7 @@ class VendorTestCaseGet(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         fake = Faker('en_IN')
         Faker.seed(100)
@@ -58,6 +87,34 @@ class VendorTestCaseGet(APITestCase):
         self.assertEqual(VendorModel.objects.count(), 10)
         print("Test: Get all Vendors -> Completed")
 
+    def test_get_vendors_paginated(self):
+        """
+        Test walking the vendor list page by page with cursors
+        """
+        url = reverse("main:vendor")
+        vendor_codes = []
+
+        response = self.client.get(url, {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            vendor_codes += [vendor['vendor_code'] for vendor in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(vendor_codes, ["AV" + str(i) for i in range(10, 20)])
+        print("Test: Get Vendors paginated -> Completed")
+
+    def test_get_vendors_unpaginated(self):
+        """
+        Test that the whole vendor list can still be requested explicitly
+        """
+        response = self.client.get(reverse("main:vendor"), {'paginate': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+        print("Test: Get Vendors unpaginated -> Completed")
+
     def test_get_vendor_by_id(self):
         """
         Test to get detail of any individual vendor by ID
@@ -97,7 +154,7 @@ class VendorTestCasePost(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
     def test_create_vendor(self):
         """
@@ -148,6 +205,91 @@ class VendorTestCasePost(APITestCase):
         print("Test: Invalid Create Vendor -> Completed")
 
 
+class VendorTestCaseBulkPut(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.vendor = VendorModel.objects.create(
+            vendor_code="AV1",
+            name="Old Name",
+            contact_details="9900990099",
+            address="Old location",
+            on_time_delivery_rate=0.5,
+            quality_rating_avg=4.0,
+            average_response_time=1.0,
+            fulfillment_rate=0.5
+        )
+
+    def vendor_data(self, vendor_code, **overrides):
+        data = {
+            "vendor_code": vendor_code,
+            "name": "Vendor " + vendor_code,
+            "contact_details": "9988776654",
+            "address": "Test Location",
+        }
+        data.update(overrides)
+        return data
+
+    def test_bulk_upsert_vendors(self):
+        """
+        Test inserting new vendors and updating existing ones in one request
+        """
+        url = reverse("main:vendor-bulk")
+        data = [self.vendor_data("AV1", name="New Name")] + [self.vendor_data("BV" + str(i)) for i in range(100)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 100, 'updated': 1, 'errors': []})
+        self.assertEqual(VendorModel.objects.count(), 101)
+        self.assertLess(len(queries), 10)
+
+        # Profile fields are overwritten, the derived metrics are kept
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.name, "New Name")
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+        self.assertEqual(VendorModel.objects.get(pk="BV7").fulfillment_rate, 0.0)
+        print("Test: Bulk upsert Vendors -> Completed")
+
+    def test_bulk_upsert_reports_row_errors(self):
+        """
+        Test that invalid and duplicate rows are reported without aborting the batch
+        """
+        url = reverse("main:vendor-bulk")
+        data = [
+            self.vendor_data("BV1"),
+            self.vendor_data("BV2", name="Invalid#Name"),
+            self.vendor_data("BV1"),
+            self.vendor_data("BV3", contact_details="phone"),
+            self.vendor_data("AV1"),
+        ]
+
+        response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('name', response.data['errors'][0]['errors'])
+        self.assertIn('vendor_code', response.data['errors'][1]['errors'])
+        self.assertIn('contact_details', response.data['errors'][2]['errors'])
+        self.assertFalse(VendorModel.objects.filter(pk__in=["BV2", "BV3"]).exists())
+        print("Test: Bulk upsert with row errors -> Completed")
+
+    def test_bulk_upsert_invalid_payload(self):
+        """
+        Test that a payload which is not a list of vendors is rejected
+        """
+        url = reverse("main:vendor-bulk")
+        self.assertEqual(self.client.put(url, self.vendor_data("BV1"), format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.put(url, [self.vendor_data("BV1", name="")], format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        print("Test: Bulk upsert with invalid payload -> Completed")
+
+
 class VendorTestCasePut(APITestCase):
     def setUp(self):
         # Create test user
@@ -160,7 +302,7 @@ class VendorTestCasePut(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         self.vendor = VendorModel.objects.create(
             vendor_code="AV8",
@@ -241,7 +383,7 @@ class VendorTestCaseDelete(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
         self.vendor = VendorModel.objects.create(
             vendor_code="AV8",
             name="Test Vendor",
@@ -299,7 +441,7 @@ class POTestCaseSetUpGet(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
         fake = Faker('en_IN')
         Faker.seed(100)
 
@@ -347,6 +489,52 @@ class POTestCases(POTestCaseSetUpGet):
         self.assertEqual(PurchaseOrderModel.objects.count(), 10)
         print("Test: Get all Orders -> Completed")
 
+    def test_get_orders_paginated(self):
+        """
+        Test that the order list is bounded and ordered by po_number
+        """
+        response = self.client.get(reverse("main:order"), {'page_size': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['po_number'] for order in response.data['results']], ["AO10", "AO11", "AO12", "AO13"])
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['po_number'], "AO14")
+        print("Test: Get Orders paginated -> Completed")
+
+    def test_get_orders_filtered(self):
+        """
+        Test filtering the order list on the server
+        """
+        url = reverse("main:order")
+        tomorrow = (timezone.now() + datetime.timedelta(days=1)).isoformat()
+
+        def count(params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(response.data['results'])
+
+        self.assertEqual(count({'vendor': "AV8", 'status': "PENDING"}), 10)
+        self.assertEqual(count({'status': "COMPLETED"}), 0)
+        self.assertEqual(count({'vendor': "AV9"}), 0)
+        self.assertEqual(count({'acknowledged': "true"}), 10)
+        self.assertEqual(count({'acknowledged': "false"}), 0)
+        self.assertEqual(count({'issue_date_after': tomorrow}), 0)
+        self.assertEqual(count({'delivery_date_after': tomorrow, 'delivery_date_before': "2999-01-01T00:00:00Z"}), 10)
+        print("Test: Get filtered Orders -> Completed")
+
+    def test_get_orders_invalid_filters(self):
+        """
+        Test that invalid order list filters are rejected
+        """
+        url = reverse("main:order")
+        for params in ({'status': "LOST"}, {'acknowledged': "maybe"}, {'issue_date_after': "soon"},
+                       {'issue_date_after': "2024-05-02T00:00:00Z", 'issue_date_before': "2024-05-01T00:00:00Z"}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print("Test: Get Orders with invalid filters -> Completed")
+
     def test_get_order_by_id(self):
         """
         Test to get details of a purchase order by ID
@@ -375,6 +563,112 @@ class POTestCases(POTestCaseSetUpGet):
         print("Test: Get non-existent Order -> Completed")
 
 
+class SparseFieldsetTestCase(POTestCaseSetUpGet):
+    def test_list_fields(self):
+        """
+        Test that ?fields= narrows the purchase order list and the selected columns
+        """
+        url = reverse("main:order") + "?fields=po_number,vendor,status&page_size=3"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {"po_number": "AO10", "status": "PENDING", "vendor": "AV8"})
+        self.assertNotIn('"items"', queries.captured_queries[-1]['sql'])
+
+        # Paging keeps working when the ordering column is not part of the output
+        response = self.client.get(reverse("main:order") + "?fields=status&page_size=3")
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 3)
+        print("Test: Sparse fieldset of the order list -> Completed")
+
+    def test_exclude_and_detail(self):
+        """
+        Test ?exclude= on lists and ?fields= on details, on both serializer paths
+        """
+        for fast_list in (True, False):
+            PurchaseOrderAPIView.fast_list = VendorAPIView.fast_list = fast_list
+            try:
+                response = self.client.get(reverse("main:order") + "?paginate=false&exclude=items")
+                self.assertEqual(len(response.data), 10)
+                self.assertNotIn("items", response.data[0])
+                self.assertIn("issue_date", response.data[0])
+
+                response = self.client.get(reverse("main:vendor") + "?fields=vendor_code,name")
+                self.assertEqual(response.data['results'], [{"vendor_code": "AV8", "name": "Test Vendor"}])
+            finally:
+                PurchaseOrderAPIView.fast_list = VendorAPIView.fast_list = True
+
+        response = self.client.get(reverse("main:order-id", args=["AO11"]) + "?fields=po_number,quantity")
+        self.assertEqual(response.data, {"po_number": "AO11", "quantity": 1})
+        response = self.client.get(reverse("main:vendor-id", args=["AV8"]) + "?exclude=address,contact_details")
+        self.assertEqual(set(response.data), {"vendor_code", "name", "on_time_delivery_rate", "quality_rating_avg",
+                                              "average_response_time", "fulfillment_rate"})
+        print("Test: Sparse fieldset with exclude and details -> Completed")
+
+    def test_invalid_fields(self):
+        """
+        Test that unknown or empty fieldsets are rejected
+        """
+        for query in ("?fields=po_number,price", "?exclude=version", "?fields=items&exclude=items"):
+            response = self.client.get(reverse("main:order") + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse("main:vendor-id", args=["AV8"]) + "?fields=items").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        print("Test: Invalid sparse fieldsets -> Completed")
+
+
+class ExportTestCase(POTestCaseSetUpGet):
+    def test_export_orders_ndjson(self):
+        """
+        Test streaming purchase orders as NDJSON
+        """
+        url = reverse("main:export", kwargs={'dataset': "purchase_orders"})
+        response = self.client.get(url, {'vendor': "AV8", 'status': "PENDING"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0]['po_number'], "AO10")
+        self.assertEqual(rows[0]['items'], [{"name": "Jeans", "price": "14.50"}])
+        print("Test: Export Orders as NDJSON -> Completed")
+
+    def test_export_orders_csv(self):
+        """
+        Test streaming purchase orders as CSV with a date filter
+        """
+        url = reverse("main:export", kwargs={'dataset': "purchase_orders"})
+        response = self.client.get(url, {'output': "csv", 'until': "2000-01-01T00:00:00Z"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][0], "po_number")
+        self.assertEqual(len(rows), 1)
+        print("Test: Export Orders as CSV -> Completed")
+
+    def test_export_invalid_filters(self):
+        """
+        Test that invalid export filters and datasets are rejected
+        """
+        url = reverse("main:export", kwargs={'dataset': "performance"})
+        self.assertEqual(self.client.get(url, {'status': "PENDING"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'since': "yesterday"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse("main:export", kwargs={'dataset': "users"})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        print("Test: Export with invalid filters -> Completed")
+
+    def test_export_command(self):
+        """
+        Test exporting purchase orders with the management command
+        """
+        out = StringIO()
+        call_command("export_data", "purchase_orders", "--vendor", "AV8", "--chunk-size", "3", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 10)
+        print("Test: Export command -> Completed")
+
+
 class POTestCasePost(APITestCase):
     def setUp(self):
         # Create test user
@@ -386,7 +680,7 @@ class POTestCasePost(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
     def test_create_order(self):
         """
@@ -481,6 +775,82 @@ class POTestCasePost(APITestCase):
         print("Test: Invalid Create Purchase Order -> Completed")
 
 
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class POTestCaseBulkPost(POTestCaseSetUpGet):
+    def order_data(self, po_number, **overrides):
+        data = {
+            "po_number": po_number,
+            "order_date": "2024-04-30T20:45:11+05:30",
+            "delivery_date": "2024-05-05T20:45:25+05:30",
+            "items": [{"name": "Item 1", "price": "2.50"}],
+            "quantity": 1,
+            "status": "PENDING",
+            "quality_rating": 4.0,
+            "issue_date": "2024-04-30T20:45:59+05:30",
+            "acknowledgement_date": "2024-04-30T21:45:59+05:30",
+            "vendor": self.vendor.vendor_code
+        }
+        data.update(overrides)
+        return data
+
+    def test_bulk_create_orders(self):
+        """
+        Test creating many purchase orders in one request
+        """
+        url = reverse("main:order-bulk")
+        data = [self.order_data("BO" + str(i)) for i in range(50)] + [self.order_data("BO50", status="COMPLETED")]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 51, 'errors': []})
+        self.assertEqual(PurchaseOrderModel.objects.count(), 61)
+        self.assertLess(len(queries), 20)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 1 / 61)
+        self.assertIsNotNone(PurchaseOrderModel.objects.get(pk="BO50").completion_date)
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 1)
+        self.assertEqual(metrics.reconcile(), [])
+        print("Test: Bulk create Purchase Orders -> Completed")
+
+    def test_bulk_create_reports_row_errors(self):
+        """
+        Test that invalid rows are reported without aborting the batch
+        """
+        url = reverse("main:order-bulk")
+        data = [
+            self.order_data("BO1"),
+            self.order_data("AO10"),
+            self.order_data("BO1"),
+            self.order_data("BO2", vendor="AV999"),
+            self.order_data("BO3", quantity="many"),
+            self.order_data("BO4"),
+        ]
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertIn('po_number', response.data['errors'][0]['errors'])
+        self.assertIn('vendor', response.data['errors'][2]['errors'])
+        self.assertIn('quantity', response.data['errors'][3]['errors'])
+        self.assertEqual(PurchaseOrderModel.objects.filter(pk__in=["BO1", "BO4"]).count(), 2)
+        print("Test: Bulk create with row errors -> Completed")
+
+    def test_bulk_create_invalid_payload(self):
+        """
+        Test that a payload which is not a list of orders is rejected
+        """
+        url = reverse("main:order-bulk")
+        self.assertEqual(self.client.post(url, self.order_data("BO1"), format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, [self.order_data("AO10")], format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        print("Test: Bulk create with invalid payload -> Completed")
+
+
 class POTestCasePut(APITestCase):
     def setUp(self):
         # Create test user
@@ -492,7 +862,7 @@ class POTestCasePut(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         self.vendor = VendorModel.objects.create(
             vendor_code="AV8",
@@ -611,7 +981,7 @@ class POTestCaseDelete(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         self.vendor = VendorModel.objects.create(
             vendor_code="AV8",
@@ -682,7 +1052,7 @@ class AcknowledgePOTestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         self.vendor = VendorModel.objects.create(
             vendor_code="AV8",
@@ -746,7 +1116,7 @@ class HistoricalPerformanceModelTestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Generate authentication token for the test user
-        self.token = Token.objects.create(user=self.user)
+        self.token = AuthToken.objects.create(user=self.user)
 
         # Create a vendor for testing
         self.vendor = VendorModel.objects.create(
@@ -795,3 +1165,1074 @@ class HistoricalPerformanceModelTestCase(APITestCase):
         print("Test: Get vendor performance data with invalid ID -> Completed")
 
 
+##########################
+# Vendor Metrics Engine #
+##########################
+class VendorMetricsTestCaseSetUp(APITestCase):
+    def setUp(self):
+        self.vendor = VendorModel.objects.create(
+            vendor_code="AV8",
+            name="Test Vendor",
+            contact_details="9900990099",
+            address="Test location",
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.other_vendor = VendorModel.objects.create(
+            vendor_code="AV9",
+            name="Other Vendor",
+            contact_details="9900990098",
+            address="Test location",
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+
+        for i in range(10, 14):
+            PurchaseOrderModel.objects.create(
+                po_number="AO" + str(i),
+                vendor=self.vendor,
+                order_date=timezone.now(),
+                delivery_date=timezone.now() + datetime.timedelta(days=5),
+                items=[{
+                    "name": "Jeans", "price": "14.50"
+                }],
+                quantity=1,
+                status="PENDING",
+                quality_rating=None,
+                issue_date=timezone.now() - datetime.timedelta(days=2),
+                acknowledgement_date=timezone.now() - datetime.timedelta(days=1)
+            )
+
+    def complete(self, po_number, quality_rating=None):
+        order = PurchaseOrderModel.objects.get(pk=po_number)
+        order.status = "COMPLETED"
+        order.quality_rating = quality_rating
+        order.save()
+        return order
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class VendorMetricsTestCase(VendorMetricsTestCaseSetUp):
+    def test_metrics_follow_transitions(self):
+        """
+        Test that vendor metrics are derived from the running aggregates
+        """
+        self.complete("AO10", quality_rating=4.0)
+        self.complete("AO11", quality_rating=2.0)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.5)
+        self.assertEqual(self.vendor.on_time_delivery_rate, 1.0)
+        self.assertEqual(self.vendor.quality_rating_avg, 3.0)
+        self.assertEqual(self.vendor.average_response_time, 1.0)
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 2)
+
+        aggregate = VendorMetricsModel.objects.get(vendor=self.vendor)
+        self.assertEqual(aggregate.issued_count, 4)
+        self.assertEqual(aggregate.completed_count, 2)
+        self.assertEqual(metrics.reconcile(), [])
+        print("Test: Vendor metrics follow PO transitions -> Completed")
+
+    def test_derived_fields_per_order(self):
+        """
+        Test that on-time flag and response seconds are stored on each order
+        """
+        PurchaseOrderModel.objects.filter(pk="AO11").update(delivery_date=timezone.now() - datetime.timedelta(days=1))
+        on_time = self.complete("AO10", quality_rating=4.0)
+        late = self.complete("AO11", quality_rating=4.0)
+        pending = PurchaseOrderModel.objects.get(pk="AO12")
+
+        self.assertTrue(on_time.is_on_time)
+        self.assertFalse(late.is_on_time)
+        self.assertIsNone(pending.is_on_time)
+        self.assertAlmostEqual(pending.response_seconds, 86400.0, places=3)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.on_time_delivery_rate, 0.5)
+        self.assertEqual(metrics.reconcile(), [])
+        print("Test: Derived fields per order -> Completed")
+
+    def test_reconcile_after_delete_and_vendor_change(self):
+        """
+        Test that deletes and vendor reassignment keep the aggregates exact
+        """
+        self.complete("AO10", quality_rating=5.0)
+        order = self.complete("AO11", quality_rating=1.0)
+        order.vendor = self.other_vendor
+        order.save()
+        PurchaseOrderModel.objects.get(pk="AO12").delete()
+
+        self.assertEqual(metrics.reconcile(), [])
+        self.vendor.refresh_from_db()
+        self.other_vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 5.0)
+        self.assertEqual(self.vendor.fulfillment_rate, 0.5)
+        self.assertEqual(self.other_vendor.fulfillment_rate, 1.0)
+        print("Test: Reconcile vendor metrics after delete -> Completed")
+
+    def test_queryset_delete_updates_metrics(self):
+        """
+        Test that deleting orders with a queryset delete() keeps the aggregates exact
+        """
+        self.complete("AO10", quality_rating=5.0)
+        self.complete("AO11", quality_rating=1.0)
+        PurchaseOrderModel.objects.filter(pk__in=["AO11", "AO12"]).delete()
+
+        self.assertEqual(metrics.reconcile(), [])
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 5.0)
+        self.assertEqual(self.vendor.fulfillment_rate, 0.5)
+        print("Test: Queryset delete updates vendor metrics -> Completed")
+
+    def test_vendor_delete_is_fast(self):
+        """
+        Test that deleting a vendor removes its orders and history without loading them, whatever their number
+        """
+        self.complete("AO10", quality_rating=5.0)
+        counts = []
+        for vendor, orders in [(self.vendor, 0), (self.other_vendor, 200)]:
+            PurchaseOrderModel.objects.bulk_create(
+                PurchaseOrderModel(po_number=f"BO{i}", vendor=vendor, order_date=timezone.now(),
+                                   delivery_date=timezone.now(), items=[{"name": "Jeans", "price": "14.50"}],
+                                   quantity=1, status="PENDING", issue_date=timezone.now())
+                for i in range(orders))
+            with CaptureQueriesContext(connection) as queries:
+                vendor.delete()
+            self.assertFalse(any('"items"' in query['sql'] for query in queries.captured_queries))
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(PurchaseOrderModel.objects.exists())
+        print("Test: Fast vendor delete -> Completed")
+
+    def test_reconcile_fixes_drift(self):
+        """
+        Test that reconciliation detects and repairs drifted aggregates
+        """
+        self.complete("AO10", quality_rating=4.0)
+        VendorMetricsModel.objects.filter(vendor=self.vendor).update(completed_count=7)
+        with self.assertRaises(CommandError):
+            call_command("reconcile_vendor_metrics", stdout=StringIO())
+
+        mismatches = metrics.reconcile(fix=True)
+        self.assertEqual(mismatches, [("AV8", "completed_count", 7, 1)])
+        self.assertEqual(metrics.reconcile(), [])
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.25)
+        print("Test: Reconcile drifted vendor metrics -> Completed")
+
+    def test_completion_stamped_once(self):
+        """
+        Test that completion is stamped only on the transition to COMPLETED
+        """
+        order = self.complete("AO10", quality_rating=4.0)
+        completion_date = order.completion_date
+        self.assertIsNotNone(completion_date)
+
+        order.quantity = 5
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.completion_date, completion_date)
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 1)
+        print("Test: Completion stamped once -> Completed")
+
+    def test_irrelevant_save_skips_metrics(self):
+        """
+        Test that saving fields the metrics do not depend on runs no metric queries
+        """
+        self.complete("AO10", quality_rating=4.0)
+        order = PurchaseOrderModel.objects.get(pk="AO10")
+        order.items = [{"name": "Shirt", "price": "9.50"}]
+        order.quantity = 2
+
+        # Only the UPDATE of the purchase order itself and the reload of its new version
+        with self.assertNumQueries(2):
+            order.save()
+        self.assertEqual(metrics.reconcile(), [])
+        print("Test: Irrelevant save skips metrics -> Completed")
+
+    def test_deferred_field_load_keeps_unsaved_changes(self):
+        """
+        Test that loading a deferred field does not take unsaved changes for the stored state
+        """
+        order = PurchaseOrderModel.objects.defer('quality_rating').get(pk="AO10")
+        order.status = "COMPLETED"
+        self.assertIsNone(order.quality_rating)
+        order.save()
+
+        order.refresh_from_db()
+        self.assertIsNotNone(order.completion_date)
+        self.assertEqual(metrics.reconcile(), [])
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.25)
+        print("Test: Deferred field load keeps unsaved changes -> Completed")
+
+    def test_single_pass_aggregates(self):
+        """
+        Test that the per-vendor and grouped aggregates each run a single query and agree
+        """
+        self.complete("AO10", quality_rating=4.0)
+        order = PurchaseOrderModel.objects.get(pk="AO11")
+        order.vendor = self.other_vendor
+        order.save()
+
+        with self.assertNumQueries(1):
+            counters = PurchaseOrderModel.objects.filter(vendor=self.vendor).metric_aggregates()
+        with self.assertNumQueries(1):
+            grouped = PurchaseOrderModel.objects.metric_aggregates_by_vendor()
+
+        self.assertEqual(grouped["AV8"], counters)
+        self.assertEqual(counters["issued_count"], 3)
+        self.assertEqual(counters["completed_count"], 1)
+        self.assertAlmostEqual(counters["response_seconds_sum"], 86400.0, places=3)
+        self.assertEqual(grouped["AV9"]["issued_count"], 1)
+        print("Test: Single-pass vendor aggregates -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="deferred")
+class DeferredRecomputeTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        recompute_queue.reset_stats()
+
+    def test_burst_recomputes_once_after_commit(self):
+        """
+        Test that a burst of completions recomputes the vendor once, after commit
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            for po_number in ("AO10", "AO11", "AO12"):
+                self.complete(po_number, quality_rating=3.0)
+
+            self.vendor.refresh_from_db()
+            self.assertEqual(self.vendor.fulfillment_rate, 0.0)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.75)
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 1)
+        self.assertEqual(recompute_queue.stats(), {'requested': 3, 'executed': 1, 'coalesced': 2})
+        print("Test: Coalesced recompute after commit -> Completed")
+
+    def test_batch_holds_recompute_until_exit(self):
+        """
+        Test that a batch coalesces recomputes across separate saves
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with recompute_queue.batch():
+                self.complete("AO10", quality_rating=3.0)
+                order = PurchaseOrderModel.objects.get(pk="AO11")
+                order.vendor = self.other_vendor
+                order.save()
+            self.assertEqual(recompute_queue.stats()['executed'], 0)
+
+        self.other_vendor.refresh_from_db()
+        self.assertEqual(self.other_vendor.fulfillment_rate, 0.0)
+        self.assertEqual(recompute_queue.stats(), {'requested': 3, 'executed': 2, 'coalesced': 1})
+        print("Test: Batched recompute -> Completed")
+
+    def test_rolled_back_requests_are_dropped(self):
+        """
+        Test that a rolled back completion inside a batch recomputes nothing and records no snapshot
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with recompute_queue.batch():
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        self.complete("AO10", quality_rating=3.0)
+                        raise IntegrityError("duplicate po_number")
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.0)
+        self.assertFalse(HistoricalPerformanceModel.objects.exists())
+        self.assertEqual(recompute_queue.stats(), {'requested': 1, 'executed': 0, 'coalesced': 0})
+
+        # Nor are they picked up by the next commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete("AO11")
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.25)
+        self.assertEqual(HistoricalPerformanceModel.objects.count(), 1)
+        self.assertEqual(recompute_queue.stats()['executed'], 1)
+        print("Test: Rolled back recompute requests -> Completed")
+
+    def test_rolled_back_savepoint_keeps_committed_requests(self):
+        """
+        Test that a rolled back savepoint after a committed completion still recomputes the committed vendor
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete("AO10", quality_rating=3.0)
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    order = PurchaseOrderModel.objects.get(pk="AO11")
+                    order.vendor = self.other_vendor
+                    order.status = "COMPLETED"
+                    order.save()
+                    raise IntegrityError("duplicate po_number")
+
+        self.vendor.refresh_from_db()
+        self.other_vendor.refresh_from_db()
+        self.assertEqual(self.vendor.fulfillment_rate, 0.25)
+        self.assertEqual(self.other_vendor.fulfillment_rate, 0.0)
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 1)
+        self.assertEqual(recompute_queue.stats()['executed'], 1)
+        self.assertEqual(recompute_queue._state().pending, {})
+        print("Test: Committed recompute requests survive a rolled back savepoint -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class RebuildVendorMetricsTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.complete("AO10", quality_rating=4.0)
+        VendorModel.objects.filter(pk="AV8").update(fulfillment_rate=0.9)
+        VendorMetricsModel.objects.filter(vendor=self.vendor).delete()
+
+    def test_dry_run_reports_diff(self):
+        """
+        Test that a dry run reports the metric changes without writing them
+        """
+        out = StringIO()
+        call_command("rebuild_vendor_metrics", "--dry-run", stdout=out)
+
+        self.assertIn("AV8: fulfillment_rate 0.9 -> 0.25", out.getvalue())
+        self.assertIn("vendors/s", out.getvalue())
+        self.assertEqual(VendorModel.objects.get(pk="AV8").fulfillment_rate, 0.9)
+        self.assertFalse(VendorMetricsModel.objects.filter(vendor=self.vendor).exists())
+        print("Test: Rebuild vendor metrics dry run -> Completed")
+
+    def test_rebuild_writes_metrics_and_snapshots(self):
+        """
+        Test that a rebuild restores aggregates, metrics and snapshots of changed vendors
+        """
+        call_command("rebuild_vendor_metrics", "--vendor", "AV8", "--since", "2000-01-01", stdout=StringIO())
+
+        self.assertEqual(VendorModel.objects.get(pk="AV8").fulfillment_rate, 0.25)
+        self.assertEqual(metrics.reconcile(), [])
+        self.assertEqual(HistoricalPerformanceModel.objects.filter(vendor=self.vendor).count(), 2)
+        self.assertFalse(HistoricalPerformanceModel.objects.filter(vendor=self.other_vendor).exists())
+        print("Test: Rebuild vendor metrics -> Completed")
+
+
+##########################
+# Query plans #
+##########################
+def full_table_scans(queries, allowed_tables=()):
+    """
+    Run SQLite EXPLAIN QUERY PLAN on the captured SELECT/UPDATE/DELETE queries and
+    return the (sql, plan detail) pairs that scan a whole table without an index.
+    """
+    scans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+                if match and ' USING ' not in detail and match.group(1) not in allowed_tables:
+                    scans.append((sql, detail))
+    return scans
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class BulkAcknowledgePOTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        PurchaseOrderModel.objects.filter(pk__in=["AO10", "AO11", "AO12"]).update(acknowledgement_date=None,
+                                                                                 response_seconds=None)
+        metrics.reconcile(fix=True)
+        self.complete("AO10", quality_rating=4.0)
+
+    def test_bulk_acknowledge(self):
+        """
+        Test acknowledging many purchase orders with per-order outcomes
+        """
+        url = reverse("main:acknowledge-bulk")
+        data = {"po_numbers": ["AO10", "AO11", "AO13", "999", "AO10"]}
+
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['acknowledged'], 2)
+        self.assertEqual(response.data['results'], {"AO10": "acknowledged", "AO11": "acknowledged",
+                                                    "AO13": "already_acknowledged", "999": "not_found"})
+
+        order = PurchaseOrderModel.objects.get(pk="AO10")
+        self.assertIsNotNone(order.acknowledgement_date)
+        self.assertIsNotNone(order.response_seconds)
+        self.assertIsNone(PurchaseOrderModel.objects.get(pk="AO12").acknowledgement_date)
+        self.assertEqual(metrics.reconcile(), [])
+        self.assertEqual(VendorMetricsModel.objects.get(vendor=self.vendor).response_count, 1)
+        print("Test: Bulk acknowledge purchase orders -> Completed")
+
+    def test_bulk_acknowledge_invalid_payload(self):
+        """
+        Test that an empty or malformed list of po_numbers is rejected
+        """
+        url = reverse("main:acknowledge-bulk")
+        for data in ({"po_numbers": []}, {"po_numbers": "AO10"}, {}):
+            response = self.client.patch(url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print("Test: Bulk acknowledge with invalid payload -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class VendorBatchTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.complete("AO10", quality_rating=2.0)
+        self.complete("AO11", quality_rating=4.0)
+
+    def test_batch_lookup(self):
+        """
+        Test looking up many vendors with their latest performance snapshot
+        """
+        url = reverse("main:vendor-batch")
+        data = {"vendor_codes": ["AV8", "AV9", "AV404", "AV8"], "include_performance": True}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(list(response.data['vendors']), ["AV8", "AV9"])
+        self.assertEqual(response.data['missing'], ["AV404"])
+
+        vendor = response.data['vendors']["AV8"]
+        latest = HistoricalPerformanceModel.objects.filter(vendor=self.vendor).latest('date', 'id')
+        self.assertEqual(vendor['name'], "Test Vendor")
+        self.assertEqual(vendor['quality_rating_avg'], 3.0)
+        self.assertEqual(vendor['latest_performance']['id'], latest.id)
+        self.assertEqual(vendor['latest_performance']['quality_rating_avg'], 3.0)
+        self.assertIsNone(response.data['vendors']["AV9"]['latest_performance'])
+        print("Test: Batch lookup of vendors -> Completed")
+
+    def test_batch_lookup_without_performance(self):
+        """
+        Test the batch lookup without snapshots and with an invalid payload
+        """
+        url = reverse("main:vendor-batch")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"vendor_codes": ["AV9"]}, format='json')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['vendors']["AV9"], self.client.get(reverse("main:vendor-id", args=["AV9"])).data)
+
+        for data in ({"vendor_codes": []}, {"vendor_codes": "AV8"}, {}):
+            self.assertEqual(self.client.post(url, data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        print("Test: Batch lookup without performance -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class ConditionalGetTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertNotModified(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+
+    def test_vendor_detail_etag(self):
+        """
+        Test that an unchanged vendor is answered with 304 and a changed one with 200
+        """
+        url = reverse("main:vendor-id", args=[self.vendor.vendor_code])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('version', response.data)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+
+        data = {"vendor_code": "AV8", "name": "Renamed Vendor", "contact_details": "9900990099",
+                "address": "Test location", "on_time_delivery_rate": 0.0, "quality_rating_avg": 0.0,
+                "average_response_time": 0.0, "fulfillment_rate": 0.0}
+        self.assertEqual(self.client.put(url, data, format='json').status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], "Renamed Vendor")
+        self.assertNotEqual(response['ETag'], etag)
+        print("Test: Conditional GET of a vendor -> Completed")
+
+    def test_completion_changes_etags(self):
+        """
+        Test that completing an order changes the order, vendor and performance ETags
+        """
+        urls = [reverse("main:order-id", args=["AO10"]),
+                reverse("main:vendor-id", args=[self.vendor.vendor_code]),
+                reverse("main:vendor-performance", args=[self.vendor.vendor_code])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        for url, etag in zip(urls, etags):
+            self.assertNotModified(url, etag)
+
+        self.complete("AO10", quality_rating=4.0)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+        # Acknowledging an already acknowledged order leaves its version alone
+        other = reverse("main:order-id", args=["AO11"])
+        etag = self.client.get(other)['ETag']
+        self.assertNotModified(other, etag)
+        self.client.patch(reverse("main:acknowledge-bulk"), {"po_numbers": ["AO11"]}, format='json')
+        self.assertNotModified(other, etag)
+
+        PurchaseOrderModel.objects.filter(pk="AO11").update(acknowledgement_date=None)
+        self.client.patch(reverse("main:acknowledge-bulk"), {"po_numbers": ["AO11"]}, format='json')
+        self.assertEqual(self.client.get(other, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        print("Test: Conditional GET after a completion -> Completed")
+
+    def test_bulk_upsert_changes_etag(self):
+        """
+        Test that the bulk vendor upsert bumps the version of updated vendors
+        """
+        url = reverse("main:vendor-id", args=[self.vendor.vendor_code])
+        etag = self.client.get(url)['ETag']
+        data = [{"vendor_code": "AV8", "name": "Renamed Vendor", "contact_details": "9900990099",
+                 "address": "Test location"}]
+        self.assertEqual(self.client.put(reverse("main:vendor-bulk"), data, format='json').status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("main:vendor-id", args=["AV404"]), HTTP_IF_NONE_MATCH=etag)
+                         .status_code, status.HTTP_404_NOT_FOUND)
+        print("Test: Conditional GET after a bulk upsert -> Completed")
+
+    def test_repeated_saves_change_etag(self):
+        """
+        Test that every save of the same instance bumps its version and ETag
+        """
+        for record, url in [(self.vendor, reverse("main:vendor-id", args=[self.vendor.vendor_code])),
+                            (PurchaseOrderModel.objects.get(pk="AO10"), reverse("main:order-id", args=["AO10"]))]:
+            etags = [self.client.get(url)['ETag']]
+            for _ in range(2):
+                record.save()
+                etags.append(self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])['ETag'])
+            self.assertEqual(len(set(etags)), 3)
+            self.assertEqual(type(record).objects.get(pk=record.pk).version, record.version)
+        print("Test: Conditional GET after repeated saves -> Completed")
+
+    def test_recreated_vendor_changes_etag(self):
+        """
+        Test that a vendor deleted and recreated with the same code does not match the old ETag
+        """
+        url = reverse("main:vendor-id", args=["AV20"])
+        data = {"vendor_code": "AV20", "name": "First Vendor", "contact_details": "9900990099",
+                "address": "Test location", "on_time_delivery_rate": 0.0, "quality_rating_avg": 0.0,
+                "average_response_time": 0.0, "fulfillment_rate": 0.0}
+        self.assertEqual(self.client.post(reverse("main:vendor"), data, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+
+        data["name"] = "Second Vendor"
+        self.client.post(reverse("main:vendor"), data, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], "Second Vendor")
+        print("Test: Conditional GET of a recreated vendor -> Completed")
+
+    def test_invalid_fieldset_with_matching_etag(self):
+        """
+        Test that invalid ?fields= are rejected with 400 even when the ETag matches
+        """
+        for url in [reverse("main:vendor-id", args=[self.vendor.vendor_code]),
+                    reverse("main:order-id", args=["AO10"])]:
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, {"fields": "bogus"}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', response.data)
+            self.assertNotIn('ETag', response)
+        print("Test: Conditional GET with invalid fields -> Completed")
+
+    def test_history_delete_changes_performance_etag(self):
+        """
+        Test that deleting performance snapshots, one at a time or with a queryset, changes the performance ETag
+        """
+        url = reverse("main:vendor-performance", args=[self.vendor.vendor_code])
+        self.complete("AO10", quality_rating=4.0)
+        self.complete("AO11", quality_rating=2.0)
+        for delete in [lambda: HistoricalPerformanceModel.objects.filter(vendor=self.vendor).first().delete(),
+                       lambda: HistoricalPerformanceModel.objects.filter(vendor=self.vendor).delete()]:
+            etag = self.client.get(url)['ETag']
+            delete()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), HistoricalPerformanceModel.objects.count())
+        print("Test: Conditional GET after a history delete -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class ResponseCacheTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        response_cache.cache.clear()
+        response_cache.reset_stats()
+
+    def test_performance_history_is_cached(self):
+        """
+        Test that the performance history is served from the cache until a completion invalidates it
+        """
+        url = reverse("main:vendor-performance", args=[self.vendor.vendor_code])
+        self.assertEqual(self.client.get(url).data, [])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data, [])
+        # Only the version lookup of the conditional GET
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response_cache.stats()['hits'], 1)
+
+        self.complete("AO10", quality_rating=4.0)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['quality_rating_avg'], 4.0)
+        self.assertEqual(response_cache.stats()['misses'], 2)
+
+        HistoricalPerformanceModel.objects.filter(vendor=self.vendor).delete()
+        self.assertEqual(self.client.get(url).data, [])
+        print("Test: Cached performance history -> Completed")
+
+    def test_vendor_writes_invalidate(self):
+        """
+        Test that the vendor update and bulk upsert endpoints invalidate the cached vendor
+        """
+        url = reverse("main:vendor-id", args=[self.vendor.vendor_code])
+        self.assertEqual(self.client.get(url).data['name'], "Test Vendor")
+
+        data = {"vendor_code": "AV8", "name": "Renamed Vendor", "contact_details": "9900990099",
+                "address": "Test location", "on_time_delivery_rate": 0.0, "quality_rating_avg": 0.0,
+                "average_response_time": 0.0, "fulfillment_rate": 0.0}
+        self.client.put(url, data, format='json')
+        self.assertEqual(self.client.get(url).data['name'], "Renamed Vendor")
+
+        data = [{"vendor_code": "AV8", "name": "Bulk Vendor", "contact_details": "9900990099",
+                 "address": "Test location"}]
+        self.client.put(reverse("main:vendor-bulk"), data, format='json')
+        self.assertEqual(self.client.get(url).data['name'], "Bulk Vendor")
+
+        self.client.delete(url)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response_cache.stats()['hits'], 0)
+        print("Test: Vendor writes invalidate the cache -> Completed")
+
+    def test_write_without_invalidation(self):
+        """
+        Test that a vendor written without invalidating this process's cache (e.g. by another worker) is not
+        served stale under its new ETag
+        """
+        url = reverse("main:vendor-id", args=[self.vendor.vendor_code])
+        self.assertEqual(self.client.get(url).data['name'], "Test Vendor")
+
+        with mock.patch.object(response_cache, 'invalidate'):
+            self.vendor.name = "Renamed Vendor"
+            self.vendor.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], "Renamed Vendor")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        print("Test: Write without cache invalidation -> Completed")
+
+    @override_settings(CACHES={**settings.CACHES,
+                               "responses": {"BACKEND": "main.cache.BoundedLocMemCache",
+                                             "LOCATION": "test-evictions",
+                                             "OPTIONS": {"MAX_ENTRIES": 4, "CULL_FREQUENCY": 2}}})
+    def test_cache_size_is_bounded(self):
+        """
+        Test that the cache evicts entries beyond MAX_ENTRIES and counts them
+        """
+        for vendor_code in ("AV8", "AV9"):
+            for name in ("main:vendor-id", "main:vendor-performance"):
+                self.client.get(reverse(name, args=[vendor_code]))
+
+        self.assertGreater(response_cache.stats()['evictions'], 0)
+        self.assertLessEqual(len(response_cache.cache._cache), 4)
+        print("Test: Bounded response cache -> Completed")
+
+
+class SingleFlightTestCase(APITestCase):
+    def setUp(self):
+        response_cache.cache.clear()
+        response_cache.reset_stats()
+        self.calls = 0
+
+    def slow_compute(self, release):
+        def compute():
+            self.calls += 1
+            release.wait(5)
+            return [{"vendor": "AV8"}]
+        return compute
+
+    def test_concurrent_misses_are_coalesced(self):
+        """
+        Test that concurrent misses of the same entry are computed once and shared
+        """
+        release = threading.Event()
+        compute = self.slow_compute(release)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            response_cache.get_or_compute('performance', "AV8", compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+
+        # Let the computation finish once every other thread waits for it
+        for _ in range(500):
+            flights = list(response_cache._flights._flights.values())
+            if flights and flights[0].waiters == 7:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [[{"vendor": "AV8"}]] * 8)
+        stats = response_cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced']), (8, 7))
+        self.assertEqual(response_cache.get_or_compute('performance', "AV8", compute), [{"vendor": "AV8"}])
+        self.assertEqual(response_cache.stats()['hits'], 1)
+        print("Test: Coalesced concurrent reads -> Completed")
+
+    @override_settings(VENDOR_RESPONSE_CACHE_LOCK=True)
+    def test_waits_for_other_worker(self):
+        """
+        Test that a miss waits for the entry another worker is computing under the cache lock
+        """
+        cache = response_cache.cache
+        key = response_cache.entry_key(cache, 'performance', "AV8")
+        cache.add(f"lock:{key}", 1)
+        threading.Timer(0.1, lambda: cache.set(key, [{"vendor": "AV8"}])).start()
+
+        data = response_cache.get_or_compute('performance', "AV8", self.slow_compute(threading.Event()))
+        self.assertEqual(data, [{"vendor": "AV8"}])
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(response_cache.stats()['coalesced_remote'], 1)
+        print("Test: Coalesced reads across workers -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class ValuesSerializerParityTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.complete("AO10", quality_rating=4.5)
+        self.complete("AO11")
+        order = PurchaseOrderModel.objects.get(pk="AO12")
+        order.status = "CANCELED"
+        order.acknowledgement_date = None
+        order.items = {"nested": [1, 2.5, None, {"name": "Jeans"}]}
+        order.save()
+
+    def assertSameJSON(self, serializer_class, queryset):
+        fast = ValuesSerializer(serializer_class)
+        self.assertEqual(json.dumps(fast.data(fast.values(queryset))),
+                         json.dumps(serializer_class(queryset, many=True).data))
+
+    def test_values_serializer_parity(self):
+        """
+        Test that the values() fast path produces exactly the serializer output
+        """
+        for timezone_name in ("Asia/Kolkata", "UTC"):
+            with timezone.override(timezone_name):
+                self.assertSameJSON(VendorModelSerializer, VendorModel.objects.order_by('pk'))
+                self.assertSameJSON(PurchaseOrderModelSerializer,
+                                    PurchaseOrderModel.objects.order_by('pk'))
+                self.assertSameJSON(HistoricalPerformanceModelSerializer,
+                                    HistoricalPerformanceModel.objects.order_by('pk'))
+        print("Test: Values serializer parity -> Completed")
+
+    def test_list_endpoints_parity(self):
+        """
+        Test that the list endpoints return the same JSON on both paths
+        """
+        urls = [reverse("main:vendor"), reverse("main:vendor") + "?paginate=false", reverse("main:order"),
+                reverse("main:order") + "?paginate=false&status=COMPLETED",
+                reverse("main:vendor-performance", args=[self.vendor.vendor_code])]
+        views = (VendorAPIView, PurchaseOrderAPIView, PerformanceDataAPIView)
+
+        fast = [self.client.get(url).content for url in urls]
+        response_cache.cache.clear()
+        try:
+            for view in views:
+                view.fast_list = False
+            slow = [self.client.get(url).content for url in urls]
+        finally:
+            for view in views:
+                view.fast_list = True
+        self.assertEqual(fast, slow)
+        print("Test: List endpoints parity -> Completed")
+
+
+class FastJSONTestCase(APITestCase):
+    def setUp(self):
+        self.data = {
+            "po_number": "AO10",
+            "order_date": datetime.datetime(2024, 4, 30, 15, 15, 11, 123456, tzinfo=datetime.timezone.utc),
+            "delivery_date": timezone.localtime(datetime.datetime(2024, 5, 5, 15, 15, tzinfo=datetime.timezone.utc)),
+            "issue_date": datetime.date(2024, 4, 30),
+            "price": decimal.Decimal("14.50"),
+            "id": uuid.UUID(int=1),
+            "items": [{"name": "Jeans \u2028 \u00e9", "quantity": 1}],
+            "counts": {1: 2},
+            "rating": None,
+            "big": 2 ** 70,
+        }
+
+    def test_renderer_matches_json_renderer(self):
+        """
+        Test that the orjson renderer produces the same bytes as DRF's JSONRenderer
+        """
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(self.data, "application/json; indent=4"),
+                         JSONRenderer().render(self.data, "application/json; indent=4"))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+        with mock.patch("main.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        print("Test: Fast JSON renderer -> Completed")
+
+    def test_parser(self):
+        """
+        Test that the orjson parser parses request bodies and rejects invalid JSON
+        """
+        body = '{"po_numbers": ["AO10", "\u00e9"], "quantity": 1.5}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), {"po_numbers": ["AO10", "\u00e9"], "quantity": 1.5})
+        for invalid in (b'{"po_numbers": [', b'{"rating": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(BytesIO(invalid))
+        print("Test: Fast JSON parser -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync",
+                   REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': {'read': '5/min', 'write': '5/min', 'recompute': '2/min'}})
+class ThrottleTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        caches['throttle'].clear()
+        throttle_stats.reset_stats()
+
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.now = 1000.0
+        patcher = mock.patch.object(TokenBucketThrottle, 'timer', lambda throttle: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def acknowledge(self, client=None):
+        return (client or self.client).patch(reverse("main:acknowledge", args=["AO10"]), {}, format='json')
+
+    def test_recompute_writes_throttled(self):
+        """
+        Test that writes triggering recomputes get 429 with Retry-After once the bucket is empty
+        """
+        self.assertEqual(self.acknowledge().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.acknowledge().status_code, status.HTTP_200_OK)
+
+        response = self.acknowledge()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        # Other scopes, endpoints and users have their own buckets
+        self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(reverse("main:vendor-batch"),
+                                          {"vendor_codes": ["AV9"]}, format='json').status_code, status.HTTP_200_OK)
+        other_client = APIClient()
+        other_client.force_authenticate(user=CustomUser.objects.create_user(email='other@example.com',
+                                                                           password='password123'))
+        self.assertEqual(self.acknowledge(other_client).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(throttle_stats.stats(), {'recompute': {'allowed': 3, 'throttled': 1},
+                                                  'read': {'allowed': 1, 'throttled': 0},
+                                                  'write': {'allowed': 1, 'throttled': 0}})
+        print("Test: Recompute writes throttled -> Completed")
+
+    def test_bucket_refills(self):
+        """
+        Test that the bucket refills at the configured rate, up to its size
+        """
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # 5/min: one request every 12 s
+        self.now += 12
+        self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.now += 3600
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("main:order")).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        print("Test: Throttle bucket refills -> Completed")
+
+
+class SQLiteProfileTestCase(APITestCase):
+    def pragmas(self, profile):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, 'CONN_MAX_AGE': 0, 'PRAGMAS': {}, 'TRANSACTION_MODE': None,
+                             **settings.SQLITE_PROFILES[profile], 'NAME': os.path.join(directory, 'profile.sqlite3')}
+            database = DatabaseWrapper(settings_dict, alias=f'profile-{profile}')
+            try:
+                with database.cursor() as cursor:
+                    values = {}
+                    for name in ('journal_mode', 'busy_timeout', 'synchronous', 'cache_size', 'mmap_size'):
+                        cursor.execute(f"PRAGMA {name}")
+                        values[name] = cursor.fetchone()[0]
+                return values, database.close_at
+            finally:
+                database.close()
+
+    def test_production_profile(self):
+        """
+        Test that the production profile sets its pragmas on new connections and keeps them open
+        """
+        values, close_at = self.pragmas("production")
+        self.assertEqual(values, {'journal_mode': 'wal', 'busy_timeout': 5000, 'synchronous': 1,
+                                  'cache_size': -64000, 'mmap_size': 268435456})
+        # Persistent connection
+        self.assertGreater(close_at, time.monotonic() + 60)
+
+        values, close_at = self.pragmas("default")
+        self.assertEqual(values['journal_mode'], 'delete')
+        print("Test: SQLite production profile -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class CollectionRouteTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_order_codes_named_like_collection_endpoints(self):
+        """
+        Test that purchase orders whose po_number matches a collection endpoint are reachable
+        """
+        order = PurchaseOrderModel.objects.get(pk="AO10")
+        for po_number in ["bulk", "acknowledge"]:
+            order.pk = po_number
+            order._state.adding = True
+            order.save()
+
+            url = reverse("main:order-id", args=[po_number])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['po_number'], po_number)
+            self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        print("Test: Purchase orders named like collection endpoints -> Completed")
+
+    def test_vendor_codes_named_like_collection_endpoints(self):
+        """
+        Test that vendors whose vendor_code matches a collection endpoint are reachable
+        """
+        for vendor_code in ["bulk", "batch"]:
+            data = {"vendor_code": vendor_code, "name": "Test Vendor", "contact_details": "9900990099",
+                    "address": "Test location", "on_time_delivery_rate": 0.0, "quality_rating_avg": 0.0,
+                    "average_response_time": 0.0, "fulfillment_rate": 0.0}
+            self.assertEqual(self.client.post(reverse("main:vendor"), data, format='json').status_code,
+                             status.HTTP_201_CREATED)
+
+            url = reverse("main:vendor-id", args=[vendor_code])
+            data["name"] = "Renamed Vendor"
+            self.assertEqual(self.client.put(url, data, format='json').status_code, status.HTTP_200_OK)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['name'], "Renamed Vendor")
+            self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        print("Test: Vendors named like collection endpoints -> Completed")
+
+
+@override_settings(VENDOR_METRICS_RECOMPUTE="sync")
+class QueryPlanTestCase(VendorMetricsTestCaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_superuser(email='testsuperuser@example.com',
+                                                        password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertIndexedQueries(self, operation, allowed_tables=()):
+        with CaptureQueriesContext(connection) as queries:
+            operation()
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(full_table_scans(queries, allowed_tables), [])
+
+    def test_metric_paths_use_indexes(self):
+        """
+        Test that the signal and metric queries never scan a whole table
+        """
+        self.assertIndexedQueries(lambda: self.complete("AO10", quality_rating=4.0))
+        self.assertIndexedQueries(lambda: PurchaseOrderModel.objects.get(pk="AO11").delete())
+        self.assertIndexedQueries(lambda: metrics.full_aggregates("AV8"))
+        self.assertIndexedQueries(lambda: metrics.rebuild_aggregates("AV8"))
+        self.assertIndexedQueries(
+            lambda: PurchaseOrderModel.objects.filter(vendor_id="AV8", status="COMPLETED",
+                                                      completion_date__gte=timezone.now()).count()
+        )
+        print("Test: Metric query plans -> Completed")
+
+    def test_view_paths_use_indexes(self):
+        """
+        Test that the list, detail, update, acknowledge and performance endpoints never scan a whole table
+        """
+        self.assertIndexedQueries(lambda: self.client.get(reverse("main:vendor-id", kwargs={'pk': "AV8"})))
+        self.assertIndexedQueries(lambda: self.client.get(reverse("main:order-id", kwargs={'pk': "AO10"})))
+        self.assertIndexedQueries(lambda: self.client.patch(reverse("main:acknowledge", kwargs={'pk': "AO10"})))
+        self.assertIndexedQueries(lambda: self.client.get(reverse("main:vendor-performance", kwargs={'pk': "AV8"})))
+        self.assertIndexedQueries(lambda: self.client.delete(reverse("main:order-id", kwargs={'pk': "AO12"})))
+        self.assertIndexedQueries(lambda: self.client.get(reverse("main:vendor")))
+        self.assertIndexedQueries(lambda: self.client.get(reverse("main:order"), {'page_size': 2}))
+        next_page = self.client.get(reverse("main:order"), {'page_size': 2}).data['next']
+        for params in ({'vendor': "AV8", 'status': "COMPLETED", 'completion_date_after': "2024-01-01T00:00:00Z"},
+                       {'vendor': "AV8", 'status': "PENDING", 'delivery_date_before': "2024-01-01T00:00:00Z"},
+                       {'issue_date_after': "2024-01-01T00:00:00Z", 'issue_date_before': "2024-02-01T00:00:00Z"}):
+            self.assertIndexedQueries(lambda: self.client.get(reverse("main:order"), params))
+        self.assertIndexedQueries(lambda: self.client.get(next_page))
+        print("Test: View query plans -> Completed")
+
+    def test_detects_full_table_scan(self):
+        """
+        Test that the harness reports a query that scans a whole table
+        """
+        with CaptureQueriesContext(connection) as queries:
+            list(PurchaseOrderModel.objects.filter(quantity=3))
+        self.assertEqual(len(full_table_scans(queries)), 1)
+        self.assertEqual(full_table_scans(queries, allowed_tables=["main_purchaseordermodel"]), [])
+        print("Test: Full table scan detection -> Completed")
+
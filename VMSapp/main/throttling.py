@@ -0,0 +1,113 @@
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Serializes the read-modify-write of a bucket within the process
+_bucket_lock = threading.Lock()
+
+
+class ThrottleStats:
+    """
+    Allowed and throttled request counts per throttle scope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def count(self, scope, allowed):
+        with self._lock:
+            self._counts[scope]['allowed' if allowed else 'throttled'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {scope: dict(counts) for scope, counts in self._counts.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = defaultdict(lambda: {'allowed': 0, 'throttled': 0})
+
+
+throttle_stats = ThrottleStats()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket rate limit per user (or client IP for anonymous requests)
+    and per view class, stored in the cache selected with the
+    API_THROTTLE_CACHE setting.
+
+    A rate of "N/period" is a bucket of N requests refilled at N per period:
+    clients may burst up to N requests, then get 429 with a Retry-After of
+    the time until the next request is allowed. A bucket is a single
+    (tokens, updated) entry, so checking it is O(1) whatever the rate.
+
+    The rate comes from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]: reads use
+    the view's `throttle_scope` ("read" by default) and writes its
+    `write_throttle_scope` ("write" by default). Views whose writes trigger
+    vendor metric recomputes use the stricter "recompute" scope.
+
+    With a cache shared by several processes, concurrent requests of the
+    same client in different processes may overdraw a bucket slightly.
+    """
+
+    def __init__(self):
+        # The scope, and so the rate, depends on the request
+        pass
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'API_THROTTLE_CACHE', 'default')]
+
+    def get_scope(self, request, view):
+        if request.method in SAFE_METHODS:
+            return getattr(view, 'throttle_scope', 'read')
+        return getattr(view, 'write_throttle_scope', 'write')
+
+    def get_rate(self):
+        # Read on every request (rather than once at import) so that setting
+        # changes are picked up
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{self.scope}' scope")
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f"throttle:{self.scope}:{type(view).__name__}:{ident}"
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        refill_rate = self.num_requests / self.duration
+        with _bucket_lock:
+            now = self.timer()
+            tokens, updated = self.cache.get(key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # An untouched bucket is full again after one period, the same as a missing one
+            self.cache.set(key, (tokens, now), math.ceil(self.duration))
+
+        self.wait_time = 0 if allowed else (1 - tokens) / refill_rate
+        throttle_stats.count(self.scope, allowed)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
@@ -1,14 +1,22 @@
 from django.urls import path
 
-from .views import VendorAPIView, PurchaseOrderAPIView, AcknowledgePOAPIView, PerformanceDataAPIView
+from .views import VendorAPIView, PurchaseOrderAPIView, AcknowledgePOAPIView, PerformanceDataAPIView, ExportAPIView, \
+    PurchaseOrderBulkAPIView, BulkAcknowledgePOAPIView, VendorBulkAPIView, VendorBatchAPIView
 
 app_name = "main"
 
+# Collection endpoints live outside the vendor/<pk>/ and purchase_orders/<pk>/
+# paths, so that no vendor_code or po_number is shadowed by them
 urlpatterns = [
+    path('vendor-bulk/', VendorBulkAPIView.as_view(), name="vendor-bulk"),
+    path('vendor-batch/', VendorBatchAPIView.as_view(), name="vendor-batch"),
+    path('purchase_orders-bulk/', PurchaseOrderBulkAPIView.as_view(), name="order-bulk"),
+    path('purchase_orders-acknowledge/', BulkAcknowledgePOAPIView.as_view(), name="acknowledge-bulk"),
     path('purchase_orders/<str:pk>/acknowledge/', AcknowledgePOAPIView.as_view(), name="acknowledge"),
     path('vendor/<str:pk>/performance/', PerformanceDataAPIView.as_view(), name="vendor-performance"),
     path('purchase_orders/<str:pk>/', PurchaseOrderAPIView.as_view(), name="order-id"),
     path('vendor/<str:pk>/', VendorAPIView.as_view(), name="vendor-id"),
     path('purchase_orders/', PurchaseOrderAPIView.as_view(), name="order"),
     path('vendor/', VendorAPIView.as_view(), name="vendor"),
+    path('export/<str:dataset>/', ExportAPIView.as_view(), name="export"),
 ]
\ No newline at end of file
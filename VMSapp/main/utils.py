@@ -0,0 +1,23 @@
+from django.db import connection
+
+
+def in_chunks(values, size=None):
+    """
+    Split values into lists small enough to be bound as the parameters of a
+    single `__in` lookup on the current database backend.
+    """
+    values = list(values)
+    size = size or connection.features.max_query_params or len(values)
+    for start in range(0, len(values), size or 1):
+        yield values[start:start + size]
+
+
+def existing_keys(queryset, field, values):
+    """
+    Return which of the values exist in `field` of the queryset, with one
+    query per parameter-sized chunk.
+    """
+    found = set()
+    for chunk in in_chunks(set(values)):
+        found.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return found
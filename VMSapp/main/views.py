@@ -3,33 +3,83 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import IntegrityError
-
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from types import SimpleNamespace
+
+from . import metrics
+from .cache import response_cache
+from .conditional import conditional_get
+from .exports import EXPORTS, CONTENT_TYPES, export_queryset, stream_rows
 from .models import VendorModel, PurchaseOrderModel, HistoricalPerformanceModel
-from .serializers import VendorModelSerializer, PurchaseOrderModelSerializer, HistoricalPerformanceModelSerializer
+from .pagination import VendorPagination, PurchaseOrderPagination
+from .recompute import recompute_queue
+from .serializers import VendorModelSerializer, PurchaseOrderModelSerializer, HistoricalPerformanceModelSerializer, \
+    ExportFilterSerializer, PurchaseOrderFilterSerializer, PurchaseOrderBulkSerializer, BulkAcknowledgeSerializer, \
+    VendorBulkSerializer, ValuesSerializer, parse_fieldset, VendorBatchSerializer
+from .utils import existing_keys, in_chunks
 
 
 # Create your views here.
 
+def check_fieldset(view, request):
+    """
+    Return a 400 response for invalid ?fields= / ?exclude= parameters, or None.
+    """
+    try:
+        parse_fieldset(request.query_params, view.list_serializer.field_names)
+    except ValidationError as e:
+        return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
 class VendorAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    # Build the list from .values() rows instead of VendorModelSerializer instances
+    fast_list = True
+    list_serializer = ValuesSerializer(VendorModelSerializer)
 
-    # Fetches vendor details: ID may or may not be provided
+    # Fetches vendor details: ID may or may not be provided; ?fields= / ?exclude= narrow the output
+    @conditional_get(VendorModel, validate=check_fieldset)
     def get(self, request, pk=None, format=None):
+        # Already validated by conditional_get
+        fieldset = parse_fieldset(request.query_params, self.list_serializer.field_names)
+        columns = self.list_serializer.subset(fieldset)
+
         sid = pk
         if sid is not None:
-            try:
-                vendor = VendorModel.objects.get(pk=sid)
-                serializer = VendorModelSerializer(vendor)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            except ObjectDoesNotExist:
+            data = response_cache.get_or_compute('vendor', sid, lambda: self.vendor_data(sid, fieldset, columns),
+                                                 params=request.query_params, etag=self.etag)
+            if data is None:
                 return Response({'msg': "Error: Invalid vendor_code"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(data, status=status.HTTP_200_OK)
 
         vendors = VendorModel.objects.all()
-        serializer = VendorModelSerializer(vendors, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = VendorPagination()
+        if self.fast_list:
+            vendors = columns.values(vendors, paginator.ordering)
+        elif fieldset is not None:
+            vendors = vendors.only(*columns.sources)
+
+        if paginator.wants_full_list(request):
+            return Response(self.list_data(vendors, fieldset, columns), status=status.HTTP_200_OK)
+
+        page = paginator.paginate_queryset(vendors, request, view=self)
+        return paginator.get_paginated_response(self.list_data(page, fieldset, columns))
+
+    def list_data(self, vendors, fieldset, columns):
+        if self.fast_list:
+            return columns.data(vendors)
+        return VendorModelSerializer(vendors, many=True, fields=fieldset).data
+
+    @staticmethod
+    def vendor_data(vendor_code, fieldset, columns):
+        vendor = VendorModel.objects.filter(pk=vendor_code).only(*columns.sources).first()
+        return VendorModelSerializer(vendor, fields=fieldset).data if vendor is not None else None
 
     # Creates a new vendor profile
     def post(self, request, format=None):
@@ -75,24 +125,165 @@ class VendorAPIView(APIView):
             return Response({'msg': 'Error - Vendor record not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class PurchaseOrderAPIView(APIView):
+class VendorBulkAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    max_batch_size = 50000
+
+    # Creates or updates many vendor profiles in one transaction
+    """
+    Rows are matched on vendor_code: new vendors are inserted and existing
+    ones get their profile fields overwritten, with one INSERT ... ON CONFLICT
+    DO UPDATE statement per batch. Invalid rows are reported by their index.
+    """
+
+    def put(self, request, format=None):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'msg': 'Error - Expected a non-empty list of vendors'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_batch_size:
+            return Response({'msg': f'Error - At most {self.max_batch_size} vendors per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # One serializer validates every row, so its fields are only built once
+        serializer = VendorBulkSerializer()
+        errors = {}
+        vendors = {}
+        for index, row in enumerate(rows):
+            try:
+                data = serializer.run_validation(row)
+            except ValidationError as e:
+                errors[index] = e.detail
+                continue
+
+            if data['vendor_code'] in vendors:
+                errors[index] = {'vendor_code': ['Duplicate vendor_code in this request.']}
+            else:
+                vendors[data['vendor_code']] = VendorModel(on_time_delivery_rate=0.0, quality_rating_avg=0.0,
+                                                           average_response_time=0.0, fulfillment_rate=0.0, **data)
 
-    # Fetches purchase order details. ID may or may not be provided
+        try:
+            with transaction.atomic():
+                existing = existing_keys(VendorModel.objects, 'vendor_code', vendors)
+                VendorModel.objects.bulk_create(
+                    vendors.values(), batch_size=500, update_conflicts=True,
+                    unique_fields=['vendor_code'], update_fields=[*VendorBulkSerializer.PROFILE_FIELDS, 'modified_at']
+                )
+                for chunk in in_chunks(existing):
+                    VendorModel.objects.filter(pk__in=chunk).update(version=F('version') + 1)
+                response_cache.invalidate(*existing)
+        except IntegrityError as e:
+            return Response({'error': 'Database integrity error: {}'.format(str(e))},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'created': len(vendors) - len(existing),
+            'updated': len(existing),
+            'errors': [{'index': index, 'vendor_code': rows[index].get('vendor_code') if isinstance(rows[index], dict)
+                        else None, 'errors': errors[index]} for index in sorted(errors)],
+        }
+        if not vendors:
+            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        return Response(response, status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_200_OK)
+
+
+class VendorBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    vendor_serializer = ValuesSerializer(VendorModelSerializer)
+    performance_serializer = ValuesSerializer(HistoricalPerformanceModelSerializer)
+
+    # Fetches many vendors at once, optionally with their latest performance snapshot
+    """
+    Vendors are read with one IN query per parameter-sized chunk, which also
+    finds the id of each vendor's latest snapshot with an indexed subquery;
+    the snapshots themselves take one more IN query. Unknown vendor codes
+    are listed under 'missing'.
+    """
+
+    def post(self, request, format=None):
+        serializer = VendorBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        vendor_codes = list(dict.fromkeys(serializer.validated_data['vendor_codes']))
+        include_performance = serializer.validated_data['include_performance']
+        latest = HistoricalPerformanceModel.objects.filter(vendor=OuterRef('pk')).order_by('-date', '-id')
+
+        vendors = {}
+        snapshot_ids = {}
+        for chunk in in_chunks(vendor_codes):
+            queryset = VendorModel.objects.filter(pk__in=chunk)
+            if include_performance:
+                queryset = queryset.annotate(latest_performance_id=Subquery(latest.values('id')[:1]))
+                rows = list(self.vendor_serializer.values(queryset, 'latest_performance_id'))
+            else:
+                rows = list(self.vendor_serializer.values(queryset))
+
+            for row, data in zip(rows, self.vendor_serializer.data(rows)):
+                vendors[data['vendor_code']] = data
+                if include_performance:
+                    data['latest_performance'] = None
+                    if row['latest_performance_id'] is not None:
+                        snapshot_ids[row['latest_performance_id']] = data['vendor_code']
+
+        for chunk in in_chunks(snapshot_ids):
+            rows = self.performance_serializer.values(HistoricalPerformanceModel.objects.filter(pk__in=chunk))
+            for snapshot in self.performance_serializer.data(rows):
+                vendors[snapshot_ids[snapshot['id']]]['latest_performance'] = snapshot
+
+        return Response({
+            'vendors': {vendor_code: vendors[vendor_code] for vendor_code in vendor_codes if vendor_code in vendors},
+            'missing': [vendor_code for vendor_code in vendor_codes if vendor_code not in vendors],
+        }, status=status.HTTP_200_OK)
+
+
+class PurchaseOrderAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    # Writes recompute the vendor's metrics: stricter rate limit
+    write_throttle_scope = "recompute"
+    # Build the list from .values() rows instead of PurchaseOrderModelSerializer instances
+    fast_list = True
+    list_serializer = ValuesSerializer(PurchaseOrderModelSerializer)
+
+    # Fetches purchase order details. ID may or may not be provided; the list can be filtered.
+    # ?fields= / ?exclude= narrow the output and the columns that are loaded
+    @conditional_get(PurchaseOrderModel, validate=check_fieldset)
     def get(self, request, pk=None, format=None):
+        # Already validated by conditional_get
+        fieldset = parse_fieldset(request.query_params, self.list_serializer.field_names)
+        columns = self.list_serializer.subset(fieldset)
+
         sid = pk
         if sid is not None:
             try:
-                order = PurchaseOrderModel.objects.get(pk=sid)
-                serializer = PurchaseOrderModelSerializer(order)
+                order = PurchaseOrderModel.objects.only(*columns.sources).get(pk=sid)
+                serializer = PurchaseOrderModelSerializer(order, fields=fieldset)
                 return Response(serializer.data, status=status.HTTP_200_OK)
 
             except ObjectDoesNotExist:
                 return Response({'msg': "Error: Invalid po_number"}, status=status.HTTP_404_NOT_FOUND)
 
-        orders = PurchaseOrderModel.objects.all()
-        serializer = PurchaseOrderModelSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        filters = PurchaseOrderFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = PurchaseOrderModel.objects.filter(**filters.get_filters())
+        paginator = PurchaseOrderPagination()
+        if self.fast_list:
+            orders = columns.values(orders, paginator.ordering)
+        elif fieldset is not None:
+            orders = orders.only(*columns.sources)
+
+        if paginator.wants_full_list(request):
+            return Response(self.list_data(orders, fieldset, columns), status=status.HTTP_200_OK)
+
+        page = paginator.paginate_queryset(orders, request, view=self)
+        return paginator.get_paginated_response(self.list_data(page, fieldset, columns))
+
+    def list_data(self, orders, fieldset, columns):
+        if self.fast_list:
+            return columns.data(orders)
+        return PurchaseOrderModelSerializer(orders, many=True, fields=fieldset).data
 
     # Creates a purchase order
     def post(self, request, format=None):
@@ -139,8 +330,79 @@ class PurchaseOrderAPIView(APIView):
             return Response({'msg': 'Error - Purchase Order record not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class PurchaseOrderBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    write_throttle_scope = "recompute"
+    max_batch_size = 10000
+
+    # Creates many purchase orders in one transaction
+    """
+    Valid rows are inserted with a single bulk_create; invalid rows are
+    reported by their index in the request without aborting the batch.
+    Vendor metrics are recomputed once per affected vendor.
+    """
+
+    def post(self, request, format=None):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'msg': 'Error - Expected a non-empty list of purchase orders'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_batch_size:
+            return Response({'msg': f'Error - At most {self.max_batch_size} purchase orders per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # One serializer validates every row, so its fields are only built once
+        serializer = PurchaseOrderBulkSerializer()
+        errors = {}
+        valid = {}
+        for index, row in enumerate(rows):
+            try:
+                valid[index] = serializer.run_validation(row)
+            except ValidationError as e:
+                errors[index] = e.detail
+
+        # Batch-wide checks: one query for the po_numbers, one for the vendors
+        existing_orders = existing_keys(PurchaseOrderModel.objects, 'po_number',
+                                        [data['po_number'] for data in valid.values()])
+        existing_vendors = existing_keys(VendorModel.objects, 'vendor_code',
+                                         [data['vendor_id'] for data in valid.values()])
+        seen = set()
+        orders = []
+        for index, data in valid.items():
+            if data['po_number'] in existing_orders or data['po_number'] in seen:
+                errors[index] = {'po_number': ['purchase order with this po number already exists.']}
+            elif data['vendor_id'] not in existing_vendors:
+                errors[index] = {'vendor': [f'Invalid pk "{data["vendor_id"]}" - object does not exist.']}
+            else:
+                seen.add(data['po_number'])
+                order = PurchaseOrderModel(**data)
+                order.stamp_completion()
+                order.set_derived_fields()
+                orders.append(order)
+
+        try:
+            with transaction.atomic():
+                PurchaseOrderModel.objects.bulk_create(orders, batch_size=500)
+                completed = {order.vendor_id for order in orders if order.status == "COMPLETED"}
+                for vendor_code in metrics.apply_contributions(orders):
+                    recompute_queue.request(vendor_code, snapshot=vendor_code in completed)
+        except IntegrityError as e:
+            return Response({'error': 'Database integrity error: {}'.format(str(e))},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'created': len(orders),
+            'errors': [{'index': index, 'po_number': rows[index].get('po_number') if isinstance(rows[index], dict)
+                        else None, 'errors': errors[index]} for index in sorted(errors)],
+        }
+        if not orders:
+            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        return Response(response, status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED)
+
+
 class AcknowledgePOAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    write_throttle_scope = "recompute"
 
     # Simulates a vendor acknowledging the purchase order.
     """
@@ -168,16 +430,94 @@ class AcknowledgePOAPIView(APIView):
             return Response({'msg': "Error: Invalid po_number"}, status=status.HTTP_404_NOT_FOUND)
 
 
+class BulkAcknowledgePOAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    write_throttle_scope = "recompute"
+
+    # Simulates a vendor acknowledging many purchase orders at once
+    """
+    Orders that are not acknowledged yet get the same acknowledgement time,
+    written with one UPDATE per parameter-sized chunk. The average response
+    time of each affected vendor is then recomputed once.
+    """
+
+    def patch(self, request, format=None):
+        serializer = BulkAcknowledgeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        po_numbers = list(dict.fromkeys(serializer.validated_data['po_numbers']))
+        results = dict.fromkeys(po_numbers, 'not_found')
+        now = timezone.now()
+        changes = []
+        acknowledged = []
+
+        with transaction.atomic():
+            for chunk in in_chunks(po_numbers):
+                for order in PurchaseOrderModel.objects.filter(pk__in=chunk).only(*PurchaseOrderModel.METRIC_FIELDS):
+                    if order.acknowledgement_date is not None:
+                        results[order.pk] = 'already_acknowledged'
+                        continue
+
+                    previous = (order.vendor_id, metrics.contribution(SimpleNamespace(**order.metric_snapshot)))
+                    order.acknowledgement_date = now
+                    order.bump_version()
+                    order.set_derived_fields()
+                    changes.append((previous, (order.vendor_id, metrics.contribution(order))))
+                    acknowledged.append(order)
+                    results[order.pk] = 'acknowledged'
+
+            PurchaseOrderModel.objects.bulk_update(acknowledged, ['acknowledgement_date', 'response_seconds',
+                                                                  *PurchaseOrderModel.VERSION_FIELDS])
+            for vendor_code in metrics.apply_changes(changes):
+                recompute_queue.request(vendor_code)
+
+        return Response({'acknowledged': len(acknowledged), 'results': results}, status=status.HTTP_200_OK)
+
+
 class PerformanceDataAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    # Build the history from .values() rows instead of HistoricalPerformanceModelSerializer instances
+    fast_list = True
+    list_serializer = ValuesSerializer(HistoricalPerformanceModelSerializer)
 
-    # Fetches historical performance data for the vendor
+    # Fetches historical performance data for the vendor; its snapshots are only
+    # recorded together with a vendor metric update, so the vendor's version applies
+    @conditional_get(VendorModel)
     def get(self, request, pk, format=None):
-        try:
-            vendor = VendorModel.objects.get(vendor_code=pk)
-            perf_record = HistoricalPerformanceModel.objects.filter(vendor=vendor)
-            serializer = HistoricalPerformanceModelSerializer(perf_record, many=True)
-
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except ObjectDoesNotExist:
+        data = response_cache.get_or_compute('performance', pk, lambda: self.performance_data(pk),
+                                             params=request.query_params, etag=self.etag)
+        if data is None:
             return Response({'msg': "Error: Invalid vendor_code"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def performance_data(self, vendor_code):
+        if not VendorModel.objects.filter(vendor_code=vendor_code).exists():
+            return None
+        perf_record = HistoricalPerformanceModel.objects.filter(vendor_id=vendor_code).order_by('date', 'id')
+        if self.fast_list:
+            return self.list_serializer.data(self.list_serializer.values(perf_record))
+        return HistoricalPerformanceModelSerializer(perf_record, many=True).data
+
+
+class ExportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # Streams every purchase order or performance record matching the filters as NDJSON or CSV
+    def get(self, request, dataset, format=None):
+        if dataset not in EXPORTS:
+            return Response({'msg': "Error: Invalid dataset"}, status=status.HTTP_404_NOT_FOUND)
+
+        filters = ExportFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            queryset = export_queryset(dataset, filters.validated_data)
+        except ValueError as e:
+            return Response({'msg': 'Error - {}'.format(str(e))}, status=status.HTTP_400_BAD_REQUEST)
+
+        output = filters.validated_data['output']
+        response = StreamingHttpResponse(stream_rows(dataset, queryset, output), content_type=CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+        return response